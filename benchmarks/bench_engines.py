@@ -0,0 +1,59 @@
+import argparse
+import random
+import time
+
+from lib.batch import create_batch, simulate_day as simulate_batch_day
+from lib.deseases import InfectableType
+from lib.memory import memory_report, batch_bytes_per_agent
+from lib.simulation import initialize, simulate_day
+
+INFECTIONS = [(InfectableType.SARSCoV2, 0.05), (InfectableType.Cholera, 0.01), (InfectableType.SeasonalFlu, 0.05)]
+
+
+def bench_object(args):
+    random.seed(args.seed)
+    context = initialize(0, 100, 0, 100, args.persons, 4, capacity=80, infections=INFECTIONS)
+    start = time.perf_counter()
+    for day in range(args.object_days):
+        simulate_day(context)
+    return args.object_days / (time.perf_counter() - start), memory_report(context).bytes_per_agent()
+
+
+def bench_batch(args):
+    context = create_batch(0, 100, 0, 100, args.persons, args.replicas, 4, capacity=80,
+                           infections=INFECTIONS, seed=args.seed)
+    start = time.perf_counter()
+    for day in range(args.days):
+        simulate_batch_day(context)
+    return args.replicas * args.days / (time.perf_counter() - start), batch_bytes_per_agent(context)
+
+
+def check_budget(engine, bytes_per_agent, budget):
+    if budget is not None and bytes_per_agent > budget:
+        raise SystemExit('{} engine uses {:.0f} bytes per agent, budget is {:.0f}'.format(
+            engine, bytes_per_agent, budget))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput of the simulation engines in replica-days per second')
+    parser.add_argument('--persons', type=int, default=1000)
+    parser.add_argument('--replicas', type=int, default=64)
+    parser.add_argument('--days', type=int, default=100)
+    parser.add_argument('--object-days', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--object-budget', type=float, default=None, help='max bytes per agent of the object engine')
+    parser.add_argument('--batch-budget', type=float, default=None, help='max bytes per agent of the batch engine')
+    args = parser.parse_args()
+
+    object_rate, object_bytes = bench_object(args)
+    batch_rate, batch_bytes = bench_batch(args)
+    print('object engine: {:10.1f} replica-days/s {:8.0f} bytes/agent'.format(object_rate, object_bytes))
+    print('batch engine:  {:10.1f} replica-days/s {:8.0f} bytes/agent ({:.0f}x)'.format(
+        batch_rate, batch_bytes, batch_rate / object_rate))
+
+    check_budget('object', object_bytes, args.object_budget)
+    check_budget('batch', batch_bytes, args.batch_budget)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,10 @@
+import itertools
 from abc import ABC, abstractmethod
 from lib.health import DepartmentOfHealth, GlobalContext
 from lib.observer import Observable, Events
 from lib.logger import Logger
 from lib.deseases import get_infectable
+from lib.random_streams import get_random
 
 class Person:
     pass
@@ -16,6 +18,9 @@ def dist(pos1, pos2):
 
 
 class State(ABC):
+    # Whether interact may act on the other person, persons in other states are skipped by the contact index
+    INTERACTS = False
+
     def __init__(self, person):
         self.person = person
 
@@ -29,7 +34,7 @@ class State(ABC):
     def interact(self, other): pass
 
     @abstractmethod
-    def get_infected(self, virus): pass
+    def get_infected(self, virus, source=None): pass
 
 
 class Healthy(State):
@@ -41,15 +46,17 @@ class Healthy(State):
 
     def interact(self, other: Person): pass
 
-    def get_infected(self, virus):
+    def get_infected(self, virus, source=None):
         if virus.get_type() not in self.person.antibody_types:
             Logger().log('Healthy', self.person.antibody_types)
-            self.person.virus = get_infectable(virus.get_type())
+            self.person.virus = get_infectable(virus.get_type(), rng=get_random('virus', self.person.id))
             self.person.set_state(AsymptomaticSick(self.person))
+            self.person.notify_observer(Events.EV_TRANSMISSION, self.person, source, virus.get_type())
 
 
 class AsymptomaticSick(State):
     DAYS_SICK_TO_FEEL_BAD = 4
+    INTERACTS = True
 
     def __init__(self, person):
         super().__init__(person)
@@ -68,10 +75,10 @@ class AsymptomaticSick(State):
         self.days_sick += 1
 
     def interact(self, other):
-        if GlobalContext().policy.try_infect():
-            other.get_infected(self.person.virus)
+        if GlobalContext().policy.try_infect(rng=get_random('infect', self.person.id)):
+            other.get_infected(self.person.virus, source=self.person)
 
-    def get_infected(self, virus): pass
+    def get_infected(self, virus, source=None): pass
 
 
 class SymptomaticSick(State):
@@ -108,7 +115,7 @@ class SymptomaticSick(State):
     def interact(self, other):
         pass
 
-    def get_infected(self, virus):
+    def get_infected(self, virus, source=None):
         pass
 
 
@@ -128,7 +135,7 @@ class Dead(State):
 
     def interact(self, other): pass
 
-    def get_infected(self, virus): pass
+    def get_infected(self, virus, source=None): pass
 
 
 class Person(Observable):
@@ -138,8 +145,15 @@ class Person(Observable):
     LIFE_THREATENING_TEMPERATURE = 40.0
     LIFE_THREATENING_WATER_PCT = 0.5
 
+    _ids = itertools.count()
+
+    @staticmethod
+    def reset_ids():
+        Person._ids = itertools.count()
+
     def __init__(self, home_position=(0, 0), age=30, weight=70):
         super().__init__()
+        self.id = next(Person._ids)
         self.virus = None
         self.antibody_types = set()
         self.temperature = 36.6
@@ -180,8 +194,8 @@ class Person(Observable):
     def interact(self, other):
         self.state.interact(other)
 
-    def get_infected(self, virus):
-        self.state.get_infected(virus)
+    def get_infected(self, virus, source=None):
+        self.state.get_infected(virus, source)
 
     def is_close_to(self, other):
         return dist(self.position, other.position) <= 0.01
@@ -0,0 +1,393 @@
+"""
+    Vectorized engine running R independent replicas of the simulation as one array program.
+
+    Every per-person attribute of the object engine (lib.basic_person.Person) is stored as an array
+    with a leading replica dimension, so one call of simulate_day advances all replicas at once.
+    The day is split into the same phases as lib.simulation.simulate_day.
+
+    The engine is statistically equivalent to the object engine, not bitwise: infections happening
+    during the contact phase do not spread further until the next day.
+"""
+import numpy as np
+
+from lib.basic_person import Person, AsymptomaticSick
+from lib.deseases import InfectableType, SeasonalFluVirus, SARSCoV2, Cholera
+from lib.health import Policy, DistrictLockdownPolicy, TotalLockdownPolicy, PPEPolicy, decide_policy
+from lib.observer import Observer
+
+HEALTHY, ASYMPTOMATIC, SYMPTOMATIC, DEAD = 0, 1, 2, 3
+
+INFECTION_TYPES = list(InfectableType)
+VIRUSES = {virus.get_type(): virus for virus in [SeasonalFluVirus, SARSCoV2, Cholera]}
+
+RATE = np.array([VIRUSES[t].RATE for t in INFECTION_TYPES])
+FEVER = np.array([VIRUSES[t].FEVER for t in INFECTION_TYPES])
+DEHYDRATION = np.array([VIRUSES[t].DEHYDRATION for t in INFECTION_TYPES])
+
+# Prescriptions of lib.perscriptor with the drugs of lib.drugs.
+# Fever is treated for flu and SARS, dehydration for cholera. Cheap antivirus is a placebo.
+# Rehydron writes person._water, so the expensive rehydration does not change the water level.
+TREATS_FEVER = np.array([t != InfectableType.Cholera for t in INFECTION_TYPES])
+ASPIRIN_EFFICIENCY = 0.5
+GLUCOSE_EFFICIENCY = 0.1
+ANTIVIRUS_EFFICIENCY = np.array([{InfectableType.SeasonalFlu: 1.0,
+                                  InfectableType.SARSCoV2: 0.1,
+                                  InfectableType.Cholera: 0.1}[t] for t in INFECTION_TYPES])
+
+NORMAL_TEMPERATURE = 36.6
+CONTACT_DISTANCE = 0.01
+
+POLICY_NONE, POLICY_DISTRICT, POLICY_TOTAL, POLICY_PPE = 0, 1, 2, 3
+
+
+def encode_policy(policy):
+    if isinstance(policy, DistrictLockdownPolicy):
+        return POLICY_DISTRICT, policy.strength, policy.max_dist
+    if isinstance(policy, TotalLockdownPolicy):
+        return POLICY_TOTAL, policy.strength, 1.0
+    if isinstance(policy, PPEPolicy):
+        return POLICY_PPE, policy.strength, 1.0
+    if type(policy) is Policy:
+        return POLICY_NONE, policy.strength, 1.0
+    raise ValueError('Policy {} is not supported by the batch engine'.format(policy))
+
+
+def contact_stencil(canvas):
+    # Cell offsets which are close according to Person.is_close_to
+    min_j, max_j, min_i, max_i = canvas
+    reach_j = int(CONTACT_DISTANCE * (max_j - min_j)) + 1
+    reach_i = int(CONTACT_DISTANCE * (max_i - min_i)) + 1
+    stencil = []
+    for dj in range(-reach_j, reach_j + 1):
+        for di in range(-reach_i, reach_i + 1):
+            d = ((dj / (max_j - min_j)) ** 2 + (di / (max_i - min_i)) ** 2) ** 0.5
+            if d <= CONTACT_DISTANCE:
+                stencil.append((dj, di))
+    return stencil
+
+
+def neighbour_sum(grid, stencil):
+    # Sums grid over the stencil around every cell, the last two axes are the canvas
+    reach_j = max(abs(dj) for dj, di in stencil)
+    reach_i = max(abs(di) for dj, di in stencil)
+    size_j, size_i = grid.shape[-2:]
+    padding = [(0, 0)] * (grid.ndim - 2) + [(reach_j, reach_j), (reach_i, reach_i)]
+    padded = np.pad(grid, padding)
+    result = np.zeros_like(grid)
+    for dj, di in stencil:
+        result += padded[..., reach_j + dj:reach_j + dj + size_j, reach_i + di:reach_i + di + size_i]
+    return result
+
+
+def try_move(rng, kind, strength, max_dist, old_pos, new_pos, canvas):
+    # Vectorized Policy.try_move, policy arrays broadcast against the persons
+    min_j, max_j, min_i, max_i = canvas
+    dx = ((old_pos[..., 0] - new_pos[..., 0]) / (max_j - min_j)) ** 2
+    dy = ((old_pos[..., 1] - new_pos[..., 1]) / (max_i - min_i)) ** 2
+    ignore = rng.random(old_pos.shape[:-1]) > strength
+    district = (kind == POLICY_DISTRICT) & ~ignore & ((dx + dy) ** 0.5 >= max_dist)
+    total = (kind == POLICY_TOTAL) & ~ignore
+    return ~(district | total)
+
+
+def infection_probability(kind, strength):
+    # Vectorized Policy.try_infect
+    return np.where(kind == POLICY_PPE, 1.0 - strength, 1.0)
+
+
+def choose_infection(rng, exposure, probability):
+    """
+        exposure: (..., n_types) number of contacts with infectors able to pass each virus type.
+        Every contact passes the virus with the given probability, the first successful one wins.
+        Returns chosen type codes, -1 when there is no infection.
+    """
+    n_contacts = exposure.sum(axis=-1)
+    p_infected = 1.0 - (1.0 - probability) ** n_contacts
+    infected = rng.random(n_contacts.shape) < p_infected
+
+    cumulative = np.cumsum(exposure, axis=-1)
+    pick = rng.random(n_contacts.shape) * n_contacts
+    chosen = (cumulative <= pick[..., None]).sum(axis=-1)
+    return np.where(infected, chosen, -1)
+
+
+class BatchObserver:
+    """Observer counters for every replica, one (R, n_types) array per day."""
+
+    def __init__(self, n_replicas):
+        self.n_replicas = n_replicas
+        self.infected_hist = []
+        self.recovered_hist = []
+        self.ab_hist = []
+        self.dead_hist = []
+        self.hospitalized_hist = []
+        self.policies = [[] for r in range(n_replicas)]
+        self.day = 0
+
+        self.reset()
+
+    def reset(self):
+        shape = (self.n_replicas, len(INFECTION_TYPES))
+        self.infected = np.zeros(shape, dtype=np.int64)
+        self.recovered = np.zeros(shape, dtype=np.int64)
+        self.ab = np.zeros(shape, dtype=np.int64)
+        self.dead = np.zeros(shape, dtype=np.int64)
+        self.hositalized = np.zeros(self.n_replicas, dtype=np.int64)
+
+    def notify_policy(self, replica, policy):
+        self.policies[replica].append((self.day, str(policy)))
+
+    def notify_day_end(self):
+        self.infected_hist.append(self.infected)
+        self.recovered_hist.append(self.recovered)
+        self.ab_hist.append(self.ab)
+        self.dead_hist.append(self.dead)
+        self.hospitalized_hist.append(self.hositalized)
+        self.day += 1
+        self.reset()
+
+    def to_observer(self, replica):
+        """Converts one replica to a regular Observer."""
+        observer = Observer([])
+        for lst in ['infected', 'recovered', 'ab', 'dead']:
+            hist = getattr(observer, lst + '_hist')
+            for day in getattr(self, lst + '_hist'):
+                hist.append({t: int(day[replica, k]) for k, t in enumerate(INFECTION_TYPES) if day[replica, k]})
+        observer.hospitalized_hist = [int(day[replica]) for day in self.hospitalized_hist]
+        observer.policies = list(self.policies[replica])
+        changes = dict(self.policies[replica])
+        for day in range(self.day):
+            observer.policy = changes.get(day, observer.policy)
+            observer.policy_hist.append(observer.policy)
+        observer.day = self.day
+        return observer
+
+    def export_df(self, replica=0):
+        return self.to_observer(replica).export_df()
+
+
+class BatchContext:
+    def __init__(self, canvas, n_replicas, n_persons, n_hospitals, capacity=100,
+                 community_position=(50, 50), seed=None):
+        self.canvas = canvas
+        self.n_replicas = n_replicas
+        self.n_persons = n_persons
+        self.rng = np.random.default_rng(seed)
+        self.stencil = contact_stencil(canvas)
+        self.observer = BatchObserver(n_replicas)
+
+        min_j, max_j, min_i, max_i = canvas
+        shape = (n_replicas, n_persons)
+
+        # Persons, see lib.simulation.create_persons
+        self.community = np.arange(n_persons) >= int(n_persons * 0.75)
+        self.community_position = np.array(community_position)
+        # The contact grid also covers a community position outside the canvas
+        self.grid_bounds = (min(min_j, community_position[0]), max(max_j, community_position[0]),
+                            min(min_i, community_position[1]), max(max_i, community_position[1]))
+        self.home = self.random_positions(shape)
+        self.position = self.home.copy()
+        self.age = self.rng.integers(1, 90, size=shape, endpoint=True).astype(float)
+        self.weight = self.rng.integers(30, 120, size=shape, endpoint=True).astype(float)
+        self.temperature = np.full(shape, NORMAL_TEMPERATURE)
+        self.water = 0.6 * self.weight
+
+        self.state = np.full(shape, HEALTHY, dtype=np.int8)
+        self.virus = np.full(shape, -1, dtype=np.int8)
+        self.strength = np.zeros(shape)
+        self.days_sick = np.zeros(shape, dtype=np.int32)
+        self.antibodies = np.zeros(shape + (len(INFECTION_TYPES),), dtype=bool)
+        self.hospital = np.full(shape, -1, dtype=np.int32)
+
+        # Hospitals, see lib.simulation.create_hospitals
+        self.capacity = np.full(n_hospitals, capacity)
+        self.expensive = self.rng.random((n_replicas, n_hospitals)) <= 0.3
+
+        self.policies = [Policy(0.0) for r in range(n_replicas)]
+        self.policy_kind = np.zeros(n_replicas, dtype=np.int8)
+        self.policy_strength = np.zeros(n_replicas)
+        self.policy_max_dist = np.ones(n_replicas)
+
+    def random_positions(self, shape):
+        min_j, max_j, min_i, max_i = self.canvas
+        return self.rng.integers([min_j, min_i], [max_j, max_i], size=shape + (2,), endpoint=True)
+
+    def set_policy(self, replica, policy):
+        self.policy_kind[replica], self.policy_strength[replica], self.policy_max_dist[replica] = \
+            encode_policy(policy)
+        self.policies[replica] = policy
+
+    def infect(self, mask, types):
+        """Healthy.get_infected for every person in mask, types are type codes."""
+        types = np.broadcast_to(types, mask.shape)
+        mask = mask & (self.state == HEALTHY)
+        mask &= ~np.take_along_axis(self.antibodies, np.maximum(types, 0)[..., None], axis=-1)[..., 0]
+        types = types[mask]
+        self.state[mask] = ASYMPTOMATIC
+        self.virus[mask] = types
+        self.strength[mask] = self.rng.exponential(1.0 / RATE[types])
+        self.days_sick[mask] = 0
+
+    def count(self, mask, types=None):
+        # (R, n_types) counts of persons in mask per virus type
+        n_types = len(INFECTION_TYPES)
+        replicas = np.nonzero(mask)[0]
+        types = (self.virus if types is None else types)[mask]
+        return np.bincount(replicas * n_types + types, minlength=self.n_replicas * n_types) \
+            .reshape(self.n_replicas, n_types)
+
+    def make_policy(self):
+        observer = self.observer
+        if len(observer.infected_hist) == 0:
+            return
+
+        new_recoveries = observer.recovered_hist[-1].sum(axis=1)
+        new_infections = observer.infected_hist[-1].sum(axis=1)
+        new_death = observer.dead_hist[-1].sum(axis=1)
+        for r in range(self.n_replicas):
+            decision = decide_policy(self.policies[r], new_infections[r], new_recoveries[r], new_death[r],
+                                     self.n_persons)
+            if decision != self.policies[r]:
+                observer.notify_policy(r, decision)
+                self.set_policy(r, decision)
+
+    def treat_patients(self):
+        replicas, persons = np.nonzero((self.hospital >= 0) & (self.virus >= 0))
+        dose1, dose2 = self.rng.random(len(replicas)), self.rng.random(len(replicas))
+        expensive = self.expensive[replicas, self.hospital[replicas, persons]]
+        types = self.virus[replicas, persons]
+        fever = TREATS_FEVER[types]
+
+        temperature = self.temperature[replicas, persons]
+        temperature = np.where(fever & expensive, NORMAL_TEMPERATURE, temperature)
+        temperature = np.where(fever & ~expensive,
+                               np.maximum(NORMAL_TEMPERATURE, temperature - dose1 * ASPIRIN_EFFICIENCY),
+                               temperature)
+        self.temperature[replicas, persons] = temperature
+
+        water = self.water[replicas, persons]
+        water = np.where(~fever & ~expensive,
+                         np.minimum(water + dose1 * GLUCOSE_EFFICIENCY, 0.6 * self.weight[replicas, persons]),
+                         water)
+        self.water[replicas, persons] = water
+
+        self.strength[replicas, persons] -= np.where(expensive, dose2 * ANTIVIRUS_EFFICIENCY[types], 0.0)
+
+    def hospitalize(self, mask):
+        n_hospitals = len(self.capacity)
+        admitted = self.hospital >= 0
+        occupancy = np.bincount(np.nonzero(admitted)[0] * n_hospitals + self.hospital[admitted],
+                                minlength=self.n_replicas * n_hospitals).reshape(self.n_replicas, n_hospitals)
+        free = np.cumsum(self.capacity - occupancy, axis=1)
+
+        # The first hospital with free beds, in the order of persons
+        queue = np.cumsum(mask, axis=1) - 1
+        replicas, persons = np.nonzero(mask)
+        hospital = (queue[replicas, persons, None] >= free[replicas]).sum(axis=1)
+        accepted = hospital < n_hospitals
+        self.hospital[replicas[accepted], persons[accepted]] = hospital[accepted]
+        self.observer.hositalized += np.bincount(replicas[accepted], minlength=self.n_replicas)
+
+    def release(self, mask):
+        released = mask & (self.hospital >= 0)
+        self.hospital[released] = -1
+        self.observer.hositalized -= released.sum(axis=1)
+
+    def die(self, mask):
+        self.state[mask] = DEAD
+        self.observer.dead += self.count(mask)
+        self.release(mask)
+
+    def move(self, mask):
+        destination = np.where(self.community[None, :, None], self.community_position,
+                               self.random_positions(mask.shape))
+        allowed = try_move(self.rng, self.policy_kind[:, None], self.policy_strength[:, None],
+                           self.policy_max_dist[:, None], self.position, destination, self.canvas)
+        self.position = np.where((mask & allowed)[..., None], destination, self.position)
+
+    def life_threatening(self):
+        return (self.temperature >= Person.LIFE_THREATENING_TEMPERATURE) | \
+               (self.water / self.weight <= Person.LIFE_THREATENING_WATER_PCT)
+
+    def life_incompatible(self):
+        return (self.temperature >= Person.MAX_TEMPERATURE_TO_SURVIVE) | \
+               (self.water / self.weight <= Person.LOWEST_WATER_PCT_TO_SURVIVE)
+
+    def day_actions(self):
+        asymptomatic = self.state == ASYMPTOMATIC
+        symptomatic = self.state == SYMPTOMATIC
+
+        self.move((self.state == HEALTHY) | asymptomatic)
+
+        types = np.maximum(self.virus, 0)
+        self.temperature += np.where(symptomatic, FEVER[types], 0.0)
+        self.water -= np.where(symptomatic, DEHYDRATION[types], 0.0)
+        self.hospitalize(symptomatic & self.life_threatening() & (self.hospital < 0))
+
+        self.die((asymptomatic | symptomatic) & self.life_incompatible())
+
+    def interact(self):
+        min_j, max_j, min_i, max_i = self.grid_bounds
+        n_types = len(INFECTION_TYPES)
+        size_j, size_i = max_j - min_j + 1, max_i - min_i + 1
+
+        infectors = self.state == ASYMPTOMATIC
+        replicas = np.nonzero(infectors)[0]
+        cells = ((replicas * n_types + self.virus[infectors]) * size_j + self.position[infectors][:, 0] - min_j) \
+            * size_i + self.position[infectors][:, 1] - min_i
+        grid = np.bincount(cells, minlength=self.n_replicas * n_types * size_j * size_i) \
+            .reshape(self.n_replicas, n_types, size_j, size_i)
+        grid = neighbour_sum(grid, self.stencil)
+
+        exposure = grid[np.arange(self.n_replicas)[:, None], :,
+                        self.position[..., 0] - min_j, self.position[..., 1] - min_i]
+        exposure = np.where(self.antibodies, 0, exposure)
+        probability = infection_probability(self.policy_kind, self.policy_strength)[:, None]
+        types = choose_infection(self.rng, exposure, probability)
+        self.infect((self.state == HEALTHY) & (types >= 0), types)
+
+    def night_actions(self):
+        healthy = self.state == HEALTHY
+        asymptomatic = self.state == ASYMPTOMATIC
+        symptomatic = self.state == SYMPTOMATIC
+
+        self.position = np.where((healthy | asymptomatic)[..., None], self.home, self.position)
+
+        feel_bad = asymptomatic & (self.days_sick == AsymptomaticSick.DAYS_SICK_TO_FEEL_BAD)
+        self.state[feel_bad] = SYMPTOMATIC
+        self.observer.infected += self.count(feel_bad)
+        self.days_sick += asymptomatic
+
+        self.strength -= np.where(symptomatic, 3.0 / self.age, 0.0)
+        recovered = symptomatic & (self.strength <= 0)
+        counts = self.count(recovered)
+        self.observer.recovered += counts
+        self.observer.ab += counts
+        replicas, persons = np.nonzero(recovered)
+        self.antibodies[replicas, persons, self.virus[recovered]] = True
+        self.state[recovered] = HEALTHY
+        self.virus[recovered] = -1
+        self.release(recovered)
+
+
+def simulate_day(context):
+    context.make_policy()
+    context.treat_patients()
+    context.day_actions()
+    context.interact()
+    context.night_actions()
+    context.observer.notify_day_end()
+
+
+def create_batch(min_j, max_j, min_i, max_i, n_persons, n_replicas, n_hospitals, capacity=100,
+                 infections=(), seed=None):
+    """
+        Batch counterpart of lib.simulation.initialize: n_replicas independent populations.
+        infections are given as there.
+    """
+    context = BatchContext((min_j, max_j, min_i, max_i), n_replicas, n_persons, n_hospitals,
+                           capacity=capacity, seed=seed)
+    for infection_type, fraction in infections:
+        mask = context.rng.random((n_replicas, n_persons)) < fraction
+        context.infect(mask, np.int8(INFECTION_TYPES.index(infection_type)))
+    return context
@@ -0,0 +1,98 @@
+"""
+    Paired scenario comparisons with common random numbers (CRN).
+
+    Every replica runs all arms from the same seed. With CRN the movement, virus and dose draws come
+    from per-agent, per-day streams (lib.random_streams), so an agent makes the same choices in
+    every arm until the scenarios really diverge, and the arm differences are much less noisy than
+    differences of independent runs.
+"""
+import random
+from statistics import variance
+
+from lib.estimation import mean_interval, difference_interval
+from lib.random_streams import RandomStreams, use_streams
+from lib.simulation import run_simulation
+
+
+def total_dead(df):
+    return df['dead_all'].sum()
+
+
+def total_infected(df):
+    return df['infected_all'].sum()
+
+
+class PairedComparison:
+    """
+        initialize_context builds a fresh context, e.g. a lambda around lib.simulation.initialize.
+        arms maps the arm name to a function applying the scenario to a new context (None for none).
+        metric reduces the exported dataframe to a number.
+    """
+
+    def __init__(self, initialize_context, arms, metric=total_dead, n_days=100, stop_conditions=()):
+        self.initialize_context = initialize_context
+        self.arms = arms
+        self.metric = metric
+        self.n_days = n_days
+        self.stop_conditions = stop_conditions
+
+    def run_arm(self, arm, seed, common_random_numbers=True):
+        random.seed(seed)
+        context = self.initialize_context()
+        setup = self.arms[arm]
+        if setup is not None:
+            setup(context)
+
+        if common_random_numbers:
+            streams = RandomStreams(seed)
+            context.observer.subscribe(streams)
+            use_streams(streams)
+        try:
+            run_simulation(context, self.n_days, self.stop_conditions)
+        finally:
+            use_streams(None)
+        return float(self.metric(context.observer.export_df()))
+
+    def run(self, seeds, common_random_numbers=True):
+        results = {arm: [] for arm in self.arms}
+        for seed in seeds:
+            for arm in self.arms:
+                results[arm].append(self.run_arm(arm, seed, common_random_numbers))
+        return ComparisonResult(results)
+
+
+class ComparisonResult:
+    def __init__(self, results):
+        # Arm name -> metric per replica, replicas in the same order for every arm
+        self.results = results
+
+    def differences(self, treatment, baseline):
+        return [t - b for t, b in zip(self.results[treatment], self.results[baseline])]
+
+    def summary(self, treatment, baseline, level=0.95):
+        """
+            Mean paired difference treatment - baseline with its confidence interval, next to the
+            interval an unpaired analysis of the same runs would give.
+        """
+        differences = self.differences(treatment, baseline)
+        mean, half_width = mean_interval(differences, level)
+        _, unpaired_half_width = difference_interval(self.results[treatment], self.results[baseline], level)
+
+        n = len(differences)
+        paired_variance, unpaired_variance, reduction = float('nan'), float('nan'), float('nan')
+        if n > 1:
+            paired_variance = variance(differences) / n
+            unpaired_variance = (variance(self.results[treatment]) + variance(self.results[baseline])) / n
+            reduction = unpaired_variance / paired_variance if paired_variance > 0 else float('inf')
+        return {
+            'difference': mean,
+            'low': mean - half_width,
+            'high': mean + half_width,
+            'unpaired_low': mean - unpaired_half_width,
+            'unpaired_high': mean + unpaired_half_width,
+            'paired_variance': paired_variance,
+            'unpaired_variance': unpaired_variance,
+            # How many times fewer replicas pairing needs for the same precision
+            'variance_reduction': reduction,
+            'replicas': n,
+        }
@@ -0,0 +1,346 @@
+"""
+    Mean-field (compartmental) engine for populations too large for agents.
+
+    Every InfectableType has its own compartments:
+    S - susceptible, A - asymptomatic, I - symptomatic, H - hospitalized, R - recovered, D - dead.
+    The onset of symptoms comes after a fixed number of nights in the agent model, so A is a chain
+    of daily stages rather than a single compartment with a geometric exit.
+    Transition rates are calibrated from short runs of the agent model, and the results are written
+    to a regular Observer, so export_df has the same schema as for the agent model.
+"""
+import math
+import random
+
+import numpy as np
+
+from lib.basic_person import Healthy, AsymptomaticSick, SymptomaticSick, Dead
+from lib.batch import INFECTION_TYPES, VIRUSES, HEALTHY, ASYMPTOMATIC, SYMPTOMATIC, DEAD
+from lib.health import Policy, decide_policy
+from lib.observer import Observer
+from lib.simulation import initialize, interact, simulate_day
+
+STATE_CODES = {Healthy: HEALTHY, AsymptomaticSick: ASYMPTOMATIC, SymptomaticSick: SYMPTOMATIC, Dead: DEAD}
+
+# Share of the population moving over the whole canvas during the day, see create_persons
+MOBILE_SHARE = 0.75
+
+
+class TransitionRates:
+    """
+        Daily transition probabilities of a single InfectableType.
+        beta is the transmission rate of the S -> A flow beta * S * A / N, onset_days the number of
+        nights from the infection to the onset of symptoms (A -> I),
+        policy_beta keeps the transmission rates observed under particular policies.
+    """
+
+    def __init__(self, beta, onset_days, eta, gamma, mu, gamma_h, mu_h, policy_beta=None):
+        self.beta = beta
+        self.onset_days = onset_days
+        self.eta = eta
+        self.gamma = gamma
+        self.mu = mu
+        self.gamma_h = gamma_h
+        self.mu_h = mu_h
+        self.policy_beta = policy_beta if policy_beta is not None else {}
+
+    def __repr__(self):
+        return 'TransitionRates(beta={:.3f}, onset_days={}, eta={:.3f}, gamma={:.3f}, mu={:.3f}, ' \
+               'gamma_h={:.3f}, mu_h={:.3f})'.format(self.beta, self.onset_days, self.eta, self.gamma, self.mu,
+                                                     self.gamma_h, self.mu_h)
+
+    def transmission(self, policy):
+        return self.policy_beta.get(str(policy), self.beta)
+
+
+def snapshot(persons):
+    state = np.array([STATE_CODES[type(p.state)] for p in persons])
+    virus = np.array([INFECTION_TYPES.index(p.virus.get_type()) if p.virus is not None else -1 for p in persons])
+    hospitalized = np.array([p.hospital is not None for p in persons])
+    antibodies = np.array([[t in p.antibody_types for t in INFECTION_TYPES] for p in persons], dtype=bool)
+    return state, virus, hospitalized, antibodies
+
+
+def _ratio(flow, stock):
+    return float(flow / stock) if stock > 0 else 0.0
+
+
+def calibrate(initialize_context, n_days=30, n_runs=1):
+    """
+        Estimates TransitionRates of every InfectableType from short runs of the agent model.
+        initialize_context is called without arguments and must return a fresh GlobalContext,
+        e.g. lambda: initialize(0, 100, 0, 100, 1000, 4, infections=...).
+        Returns a dict InfectableType -> TransitionRates.
+    """
+    n_types = len(INFECTION_TYPES)
+    flows = {name: np.zeros(n_types) for name in ['eta', 'gamma', 'mu', 'gamma_h', 'mu_h']}
+    stocks = {name: np.zeros(n_types) for name in ['A', 'I', 'H']}
+    infections, exposure = {}, {}
+    # Nights from the infection to the onset, summed over the onsets
+    onset_nights, onsets = np.zeros(n_types), np.zeros(n_types)
+
+    for run in range(n_runs):
+        context = initialize_context()
+        before = snapshot(context.persons)
+        # Day of the infection of every asymptomatic person, the initial infections are of day 0
+        infected_day = np.where(before[0] == ASYMPTOMATIC, 0, -1)
+        for day in range(n_days):
+            simulate_day(context)
+            after = snapshot(context.persons)
+            policy = str(context.policy)
+            infections.setdefault(policy, np.zeros(n_types))
+            exposure.setdefault(policy, np.zeros(n_types))
+
+            state, virus, hospitalized, antibodies = before
+            new_state, new_virus, new_hospitalized, new_antibodies = after
+            population = len(state)
+            infected_day[(state != ASYMPTOMATIC) & (new_state == ASYMPTOMATIC)] = day
+            onset = (state == ASYMPTOMATIC) & (new_state == SYMPTOMATIC)
+            for k in range(n_types):
+                of_type = virus == k
+                susceptible = (state == HEALTHY) & ~antibodies[:, k]
+                asymptomatic = (state == ASYMPTOMATIC) & of_type
+                symptomatic = (state == SYMPTOMATIC) & of_type & ~hospitalized
+                in_hospital = (state == SYMPTOMATIC) & of_type & hospitalized
+
+                infections[policy][k] += np.sum(susceptible & (new_state == ASYMPTOMATIC) & (new_virus == k))
+                exposure[policy][k] += susceptible.sum() * asymptomatic.sum() / population
+
+                stocks['A'][k] += asymptomatic.sum()
+                stocks['I'][k] += symptomatic.sum()
+                stocks['H'][k] += in_hospital.sum()
+                onsets[k] += np.sum(onset & of_type)
+                onset_nights[k] += np.sum(day - infected_day[onset & of_type] + 1)
+                flows['eta'][k] += np.sum(symptomatic & (new_state == SYMPTOMATIC) & new_hospitalized)
+                flows['gamma'][k] += np.sum(symptomatic & (new_state == HEALTHY))
+                flows['mu'][k] += np.sum(symptomatic & (new_state == DEAD))
+                flows['gamma_h'][k] += np.sum(in_hospital & (new_state == HEALTHY))
+                flows['mu_h'][k] += np.sum(in_hospital & (new_state == DEAD))
+            before = after
+
+    total_infections = sum(infections.values())
+    total_exposure = sum(exposure.values())
+    rates = {}
+    for k, infection_type in enumerate(INFECTION_TYPES):
+        rates[infection_type] = TransitionRates(
+            beta=_ratio(total_infections[k], total_exposure[k]),
+            onset_days=max(int(round(_ratio(onset_nights[k], onsets[k]))), 1),
+            eta=_ratio(flows['eta'][k], stocks['I'][k]),
+            gamma=_ratio(flows['gamma'][k], stocks['I'][k]),
+            mu=_ratio(flows['mu'][k], stocks['I'][k]),
+            gamma_h=_ratio(flows['gamma_h'][k], stocks['H'][k]),
+            mu_h=_ratio(flows['mu_h'][k], stocks['H'][k]),
+            policy_beta={policy: _ratio(infections[policy][k], exposure[policy][k])
+                         for policy in infections if exposure[policy][k] > 0},
+        )
+    return rates
+
+
+class CompartmentalModel:
+    def __init__(self, population, rates, capacity=0, infections=()):
+        """
+            rates is a dict InfectableType -> TransitionRates, capacity is the total number of hospital beds.
+            infections are given as in lib.simulation.initialize.
+        """
+        n_types = len(INFECTION_TYPES)
+        self.population = population
+        self.rates = [rates[t] for t in INFECTION_TYPES]
+        self.capacity = capacity
+        self.policy = Policy(0.0)
+        self.observer = Observer([])
+
+        # Asymptomatic by the nights spent in A, the last stage turns symptomatic at the end of the day
+        self.stages = np.zeros((n_types, max(r.onset_days for r in self.rates)))
+        self.I = np.zeros(n_types)
+        self.H = np.zeros(n_types)
+        self.R = np.zeros(n_types)
+        self.D = np.zeros(n_types)
+
+        healthy = float(population)
+        for infection_type, fraction in infections:
+            infected = healthy * fraction
+            self.stages[INFECTION_TYPES.index(infection_type), self.first_stage(infection_type)] += infected
+            healthy -= infected
+        self.S = population - self.A
+
+    def first_stage(self, infection_type):
+        # Shorter chains of a type start further down the common one
+        return self.stages.shape[1] - self.rates[INFECTION_TYPES.index(infection_type)].onset_days
+
+    @property
+    def A(self):
+        return self.stages.sum(axis=1)
+
+    def rate(self, name):
+        return np.array([getattr(r, name) for r in self.rates])
+
+    def transmission(self):
+        return np.array([r.transmission(self.policy) for r in self.rates])
+
+    def make_policy(self):
+        observer = self.observer
+        if len(observer.infected_hist) == 0:
+            return
+
+        decision = decide_policy(self.policy,
+                                 sum(observer.infected_hist[-1].values()),
+                                 sum(observer.recovered_hist[-1].values()),
+                                 sum(observer.dead_hist[-1].values()),
+                                 self.population)
+        if decision != self.policy:
+            observer.notify_policy(decision)
+        self.policy = decision
+
+    def susceptible(self):
+        """
+            Healthy persons without antibodies of every type. S counts the persons who never had a
+            type, but like in the agent model only healthy ones can get infected: the healthy share
+            of S + R is applied to S, assuming immunity independent of the other types.
+        """
+        sick = (self.A + self.I + self.H + self.D).sum()
+        healthy = max(self.population - sick, 0.0)
+        available = self.S + self.R
+        return np.where(available > 0, healthy * self.S / np.maximum(available, 1e-12), 0.0)
+
+    def advance(self, extra_force=0.0):
+        """One day of the mean-field flows. extra_force is added to the force of infection of every type."""
+        force = self.transmission() * self.A / self.population + extra_force
+        infected = np.minimum(self.susceptible() * (1.0 - np.exp(-force)), self.S)
+        for k, infection_type in enumerate(INFECTION_TYPES):
+            self.stages[k, self.first_stage(infection_type)] += infected[k]
+        onset = self.stages[:, -1].copy()
+        self.stages[:, 1:] = self.stages[:, :-1].copy()
+        self.stages[:, 0] = 0.0
+
+        demand = self.rate('eta') * self.I
+        free = max(self.capacity - self.H.sum(), 0.0)
+        admitted = demand * min(1.0, free / demand.sum()) if demand.sum() > 0 else demand
+        recovered, dead = self.rate('gamma') * self.I, self.rate('mu') * self.I
+        released, dead_h = self.rate('gamma_h') * self.H, self.rate('mu_h') * self.H
+
+        self.S -= infected
+        self.I += onset - admitted - recovered - dead
+        self.H += admitted - released - dead_h
+        self.R += recovered + released
+        self.D += dead + dead_h
+
+        observer = self.observer
+        for k, infection_type in enumerate(INFECTION_TYPES):
+            if onset[k] > 0:
+                observer.infected[infection_type] += onset[k]
+            if recovered[k] + released[k] > 0:
+                observer.recovered[infection_type] += recovered[k] + released[k]
+                observer.ab[infection_type] += recovered[k] + released[k]
+            if dead[k] + dead_h[k] > 0:
+                observer.dead[infection_type] += dead[k] + dead_h[k]
+        observer.hositalized += admitted.sum() - released.sum() - dead_h.sum()
+        observer.day_finished()
+
+    def simulate_day(self):
+        self.make_policy()
+        self.advance()
+
+    def export_df(self):
+        return self.observer.export_df()
+
+
+def canvas_cells(canvas):
+    min_j, max_j, min_i, max_i = canvas
+    return (max_j - min_j + 1) * (max_i - min_i + 1)
+
+
+class HybridSimulation:
+    """
+        Agents live in the focus region of the canvas, the rest of the population is a CompartmentalModel.
+        Agents moving out of the focus region are exposed to the mean-field infection pressure and add
+        to it when contagious. Mobile mean-field residents visit the focus region in proportion to its area.
+        The policy decided by the agents' DepartmentOfHealth applies to the whole canvas.
+    """
+
+    def __init__(self, context, focus, model):
+        if not context.persons:
+            # The mean-field coupling is per agent
+            raise ValueError('the focus region {} holds no agents'.format(focus))
+        self.context = context
+        self.focus = focus
+        self.model = model
+        self.focus_share = canvas_cells(focus) / canvas_cells(context.canvas)
+
+    def in_focus(self, position):
+        min_j, max_j, min_i, max_i = self.focus
+        return min_j <= position[0] <= max_j and min_i <= position[1] <= max_i
+
+    def contagious(self, persons):
+        counts = np.zeros(len(INFECTION_TYPES))
+        for person in persons:
+            if isinstance(person.state, AsymptomaticSick):
+                counts[INFECTION_TYPES.index(person.virus.get_type())] += 1
+        return counts
+
+    def expose(self, persons, force):
+        total = force.sum()
+        if total <= 0:
+            return
+        p_infected = 1.0 - math.exp(-total)
+        for person in persons:
+            if isinstance(person.state, Healthy) and random.random() < p_infected:
+                infection_type = random.choices(INFECTION_TYPES, weights=force)[0]
+                person.get_infected(VIRUSES[infection_type])
+
+    def simulate_day(self):
+        context, model = self.context, self.model
+        persons = context.persons
+
+        context.health_dept.make_policy()
+        model.policy = context.policy
+
+        for hospital in context.health_dept.hospitals:
+            hospital.treat_patients()
+
+        for person in persons:
+            person.day_actions()
+
+        outside = [p for p in persons if not self.in_focus(p.position)]
+        inside = [p for p in persons if self.in_focus(p.position)]
+        contagious_outside, contagious_inside = self.contagious(outside), self.contagious(inside)
+
+        beta = model.transmission()
+        visitors = model.A * MOBILE_SHARE * self.focus_share
+        self.expose(outside, beta * (model.A + contagious_outside) / model.population)
+        self.expose(inside, beta * visitors / len(persons))
+
+        interact(persons)
+
+        for person in persons:
+            person.night_actions()
+
+        context.observer.notify_day_end()
+
+        model.advance(beta * contagious_outside / model.population +
+                      MOBILE_SHARE * self.focus_share * beta * contagious_inside / len(persons))
+
+    def export_df(self):
+        agents = self.context.observer.export_df()
+        mean_field = self.model.export_df()
+        columns = [c for c in agents.columns] + [c for c in mean_field.columns if c not in agents.columns]
+        agents = agents.reindex(columns=columns, fill_value=0)
+        mean_field = mean_field.reindex(columns=columns, fill_value=0)
+        result = agents + mean_field
+        result['day'] = agents['day']
+        return result
+
+
+def initialize_hybrid(canvas, focus, n_persons, n_hospitals, rates, capacity=100, infections=()):
+    """
+        Builds a HybridSimulation of n_persons spread uniformly over the canvas.
+        Persons living in the focus region and their share of hospital beds are simulated by agents.
+    """
+    share = canvas_cells(focus) / canvas_cells(canvas)
+    n_agents = int(round(n_persons * share))
+    agents_capacity = int(math.ceil(capacity * share))
+
+    context = initialize(*focus, n_agents, n_hospitals, capacity=agents_capacity, infections=infections)
+    context.canvas = canvas
+
+    model = CompartmentalModel(n_persons - n_agents, rates,
+                               capacity=n_hospitals * (capacity - agents_capacity), infections=infections)
+    return HybridSimulation(context, focus, model)
@@ -0,0 +1,66 @@
+"""
+    Spatial contact index for the object engine.
+
+    Gives the same calls in the same order as the all-pairs loop
+
+        for person in persons:
+            for other in persons:
+                if person is not other and person.is_close_to(other):
+                    person.interact(other)
+
+    but only persons whose state INTERACTS at their turn look for contacts, and only among nearby
+    positions. Persons are grouped by exact position first, so a crowded venue costs one distance
+    check per pair of distinct positions however many persons stand there.
+"""
+import math
+from heapq import merge
+
+from lib.basic_person import dist
+
+CONTACT_DISTANCE = 0.01
+
+
+class ContactIndex:
+    def __init__(self, persons, canvas):
+        min_j, max_j, min_i, max_i = canvas
+        # Cells at least as large as the contact distance, contacts are in the 3x3 block around a cell
+        self.cell_j = CONTACT_DISTANCE * (max_j - min_j)
+        self.cell_i = CONTACT_DISTANCE * (max_i - min_i)
+
+        # Exact position -> person indices in increasing order
+        self.at_position = {}
+        for idx, person in enumerate(persons):
+            self.at_position.setdefault(tuple(person.position), []).append(idx)
+
+        self.cells = {}
+        for position in self.at_position:
+            self.cells.setdefault(self.cell(position), []).append(position)
+        self.close_positions = {}
+
+    def cell(self, position):
+        return math.floor(position[0] / self.cell_j), math.floor(position[1] / self.cell_i)
+
+    def neighbour_positions(self, position):
+        close = self.close_positions.get(position)
+        if close is None:
+            cell_j, cell_i = self.cell(position)
+            close = [other for dj in (-1, 0, 1) for di in (-1, 0, 1)
+                     for other in self.cells.get((cell_j + dj, cell_i + di), ())
+                     if other == position or dist(position, other) <= CONTACT_DISTANCE]
+            self.close_positions[position] = close
+        return close
+
+    def contacts(self, idx, position):
+        """Indices of the persons close to the position in increasing order, idx excluded."""
+        groups = [self.at_position[other] for other in self.neighbour_positions(position)]
+        for other in (groups[0] if len(groups) == 1 else merge(*groups)):
+            if other != idx:
+                yield other
+
+
+def interact_indexed(persons, canvas):
+    index = ContactIndex(persons, canvas)
+    for idx, person in enumerate(persons):
+        if person.state.INTERACTS:
+            for other in index.contacts(idx, tuple(person.position)):
+                person.interact(persons[other])
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from random import expovariate
+import random
 from enum import Enum
 from lib.logger import Logger
 
@@ -8,6 +8,12 @@ class Person:
 
 
 class Infectable(ABC):
+    # rate of the exponential distribution the strength and contag are drawn from
+    RATE = 1.0
+    # per day symptoms progression
+    FEVER = 0.0
+    DEHYDRATION = 0.0
+
     def __init__(self, strength=1.0, contag=1.0):
         # contag is for contagiousness so we have less typos
         self.strength = strength
@@ -20,8 +26,11 @@ class Infectable(ABC):
 
 
 class SeasonalFluVirus(Infectable):
+    RATE = 10.0
+    FEVER = 0.25
+
     def cause_symptoms(self, person):
-        person.temperature += 0.25
+        person.temperature += self.FEVER
 
     @staticmethod
     def get_type():
@@ -29,8 +38,11 @@ class SeasonalFluVirus(Infectable):
 
 
 class SARSCoV2(Infectable):
+    RATE = 0.42
+    FEVER = 0.5
+
     def cause_symptoms(self, person):
-        person.temperature += 0.5
+        person.temperature += self.FEVER
 
     @staticmethod
     def get_type():
@@ -38,8 +50,11 @@ class SARSCoV2(Infectable):
 
 
 class Cholera(Infectable):
+    RATE = 2.0
+    DEHYDRATION = 1.0
+
     def cause_symptoms(self, person):
-        person.water -= 1.0
+        person.water -= self.DEHYDRATION
 
     @staticmethod
     def get_type():
@@ -52,15 +67,15 @@ class InfectableType(Enum):
     Cholera = 3
 
 
-def get_infectable(infectable_type: InfectableType):
+def get_infectable(infectable_type: InfectableType, rng=random):
     if InfectableType.SeasonalFlu == infectable_type:
-        return SeasonalFluVirus(strength=expovariate(10.0), contag=expovariate(10.0))
+        return SeasonalFluVirus(strength=rng.expovariate(SeasonalFluVirus.RATE), contag=rng.expovariate(SeasonalFluVirus.RATE))
 
     elif InfectableType.SARSCoV2 == infectable_type:
-        return SARSCoV2(strength=expovariate(0.42), contag=expovariate(0.42))
+        return SARSCoV2(strength=rng.expovariate(SARSCoV2.RATE), contag=rng.expovariate(SARSCoV2.RATE))
 
     elif InfectableType.Cholera == infectable_type:
-        return Cholera(strength=expovariate(2.0), contag=expovariate(2.0))
+        return Cholera(strength=rng.expovariate(Cholera.RATE), contag=rng.expovariate(Cholera.RATE))
 
     else:
         raise ValueError()
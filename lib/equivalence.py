@@ -0,0 +1,150 @@
+"""
+    Equivalence harness between simulation engines (object, batch and sharded runners).
+
+    A runner maps a list of seeds to one daily dataframe (Observer.export_df schema) per seed.
+    compare runs a reference and a candidate runner on the same Scenario and compares, for every
+    curve (infected, recovered, dead per InfectableType and hospitalized), the distribution over
+    runs of its total, peak and peak day with two-sample Kolmogorov-Smirnov and Mann-Whitney
+    tests. The p-values are Holm-adjusted, so `alpha` bounds the probability of any false alarm
+    when the engines are equivalent. identical checks exact equality, for changes which promise
+    the same results for the same seed.
+"""
+import random
+
+import numpy as np
+import pandas as pd
+
+from lib.deseases import InfectableType
+from lib.estimation import ks_test, mann_whitney_test, holm_adjust
+
+CURVES = ['infected', 'recovered', 'dead']
+STATISTICS = ['total', 'peak', 'peak_day']
+
+
+class Scenario:
+    def __init__(self, canvas, n_persons, n_hospitals, capacity=100, infections=(), n_days=60):
+        self.canvas = canvas
+        self.n_persons = n_persons
+        self.n_hospitals = n_hospitals
+        self.capacity = capacity
+        self.infections = infections
+        self.n_days = n_days
+
+    def columns(self):
+        return ['{}_{}'.format(curve, infection_type.name)
+                for curve in CURVES for infection_type in InfectableType] + ['hospitalized']
+
+
+def object_runner(scenario, setup=None, extinction=False):
+    """Runner of the object engine (lib.simulation), setup(context) may modify every new context."""
+    from lib.simulation import initialize, run_simulation
+
+    def run(seeds):
+        dfs = []
+        for seed in seeds:
+            random.seed(seed)
+            context = initialize(*scenario.canvas, scenario.n_persons, scenario.n_hospitals,
+                                 capacity=scenario.capacity, infections=scenario.infections)
+            if setup is not None:
+                setup(context)
+            run_simulation(context, scenario.n_days, extinction=extinction)
+            dfs.append(context.observer.export_df())
+        return dfs
+    return run
+
+
+def batch_runner(scenario):
+    """Runner of the batch engine (lib.batch), all seeds are replicas of one batch seeded by the first."""
+    from lib.batch import create_batch, simulate_day
+
+    def run(seeds):
+        context = create_batch(*scenario.canvas, scenario.n_persons, len(seeds), scenario.n_hospitals,
+                               capacity=scenario.capacity, infections=scenario.infections, seed=seeds[0])
+        for day in range(scenario.n_days):
+            simulate_day(context)
+        return [context.observer.export_df(replica) for replica in range(len(seeds))]
+    return run
+
+
+def sharded_runner(scenario, tiles=(2, 1)):
+    """Runner of the multi-process engine (lib.sharded), one ShardedSimulation per seed."""
+    from lib.sharded import ShardedSimulation
+
+    def run(seeds):
+        dfs = []
+        for seed in seeds:
+            with ShardedSimulation(scenario.canvas, scenario.n_persons, scenario.n_hospitals,
+                                   capacity=scenario.capacity, tiles=tiles, infections=scenario.infections,
+                                   seed=seed) as simulation:
+                for day in range(scenario.n_days):
+                    simulation.simulate_day()
+                dfs.append(simulation.export_df())
+        return dfs
+    return run
+
+
+def curve_statistics(dfs, columns):
+    """{(column, statistic): values over runs}, missing columns are zero curves."""
+    result = {}
+    for column in columns:
+        curves = [df[column].to_numpy() if column in df else np.zeros(len(df)) for df in dfs]
+        if column == 'hospitalized':
+            # Occupancy instead of the net daily flow
+            curves = [np.cumsum(curve) for curve in curves]
+        result[(column, 'total')] = [float(curve.sum()) for curve in curves]
+        result[(column, 'peak')] = [float(curve.max()) if len(curve) else 0.0 for curve in curves]
+        result[(column, 'peak_day')] = [float(np.argmax(curve)) if len(curve) else 0.0 for curve in curves]
+    return result
+
+
+class EquivalenceReport:
+    def __init__(self, results, alpha):
+        self.results = results
+        self.alpha = alpha
+
+    def __repr__(self):
+        failed = self.failures()
+        if len(failed) == 0:
+            return 'EquivalenceReport(passed, {} tests)'.format(len(self.results))
+        return 'EquivalenceReport(failed)\n' + failed.to_string(index=False)
+
+    @property
+    def passed(self):
+        return len(self.failures()) == 0
+
+    def failures(self):
+        return self.results[self.results['rejected']]
+
+
+def compare(reference, candidate, scenario, seeds, alpha=0.01, candidate_seeds=None):
+    """
+        Runs both engines and tests every curve statistic for a difference in distribution.
+        Constant statistics equal in both samples are skipped. candidate_seeds defaults to seeds.
+    """
+    columns = scenario.columns()
+    expected = curve_statistics(reference(list(seeds)), columns)
+    observed = curve_statistics(candidate(list(candidate_seeds if candidate_seeds is not None else seeds)), columns)
+
+    rows = []
+    for key in expected:
+        first, second = expected[key], observed[key]
+        if len(set(first) | set(second)) <= 1:
+            continue
+        for test_name, test in [('ks', ks_test), ('mann_whitney', mann_whitney_test)]:
+            statistic, p_value = test(first, second)
+            rows.append({'column': key[0], 'statistic': key[1], 'test': test_name,
+                         'reference_mean': np.mean(first), 'candidate_mean': np.mean(second),
+                         'test_statistic': statistic, 'p': p_value})
+
+    results = pd.DataFrame(rows, columns=['column', 'statistic', 'test', 'reference_mean', 'candidate_mean',
+                                          'test_statistic', 'p'])
+    results['p_adjusted'] = holm_adjust(list(results['p']))
+    results['rejected'] = results['p_adjusted'] <= alpha
+    return EquivalenceReport(results, alpha)
+
+
+def identical(reference, candidate, seeds):
+    """Seeds for which the candidate dataframe differs from the reference one, empty when all are equal."""
+    seeds = list(seeds)
+    return [seed for seed, expected, observed in zip(seeds, reference(seeds), candidate(seeds))
+            if not expected.equals(observed)]
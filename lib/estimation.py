@@ -0,0 +1,103 @@
+"""
+    Small estimation helpers shared by the experiment runners: t quantiles and confidence intervals.
+"""
+import math
+from statistics import NormalDist, fmean, variance
+
+
+def t_quantile(p, df):
+    """Quantile of Student's t distribution, exact for df 1 and 2, Cornish-Fisher expansion above."""
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) * math.sqrt(2 / (4 * p * (1 - p)))
+    z = NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+
+def mean_interval(values, level=0.95):
+    """Mean of the values with the half width of its t confidence interval."""
+    values = list(values)
+    mean = fmean(values)
+    if len(values) < 2:
+        return mean, float('inf')
+    standard_error = math.sqrt(variance(values) / len(values))
+    return mean, t_quantile(0.5 + level / 2, len(values) - 1) * standard_error
+
+
+def difference_interval(first, second, level=0.95):
+    """Difference of means of two independent samples with the Welch confidence half width."""
+    first, second = list(first), list(second)
+    if len(first) < 2 or len(second) < 2:
+        return fmean(first) - fmean(second), float('inf')
+    var_first, var_second = variance(first) / len(first), variance(second) / len(second)
+    standard_error = math.sqrt(var_first + var_second)
+    if standard_error == 0:
+        return fmean(first) - fmean(second), 0.0
+    # Welch-Satterthwaite degrees of freedom
+    df = (var_first + var_second) ** 2 / (var_first ** 2 / (len(first) - 1) + var_second ** 2 / (len(second) - 1))
+    return fmean(first) - fmean(second), t_quantile(0.5 + level / 2, max(1, round(df))) * standard_error
+
+
+def kolmogorov_survival(x):
+    """P(K > x) of the Kolmogorov distribution."""
+    if x <= 0:
+        return 1.0
+    if x < 1.18:
+        # Series converging fast for small x
+        y = math.exp(-math.pi ** 2 / (8 * x ** 2))
+        return 1.0 - math.sqrt(2 * math.pi) / x * sum(y ** ((2 * k - 1) ** 2) for k in range(1, 6))
+    return min(1.0, 2 * sum((-1) ** (k - 1) * math.exp(-2 * k ** 2 * x ** 2) for k in range(1, 101)))
+
+
+def ks_test(first, second):
+    """Two-sample Kolmogorov-Smirnov statistic with its asymptotic p-value (Stephens' correction)."""
+    first, second = sorted(first), sorted(second)
+    n, m = len(first), len(second)
+    statistic, i, j = 0.0, 0, 0
+    while i < n and j < m:
+        value = min(first[i], second[j])
+        while i < n and first[i] == value:
+            i += 1
+        while j < m and second[j] == value:
+            j += 1
+        statistic = max(statistic, abs(i / n - j / m))
+    effective = math.sqrt(n * m / (n + m))
+    return statistic, kolmogorov_survival((effective + 0.12 + 0.11 / effective) * statistic)
+
+
+def mann_whitney_test(first, second):
+    """Two-sided Mann-Whitney U test, normal approximation with tie and continuity corrections."""
+    n, m = len(first), len(second)
+    pooled = sorted([(value, 0) for value in first] + [(value, 1) for value in second])
+    rank_sum, ties, k = 0.0, 0.0, 0
+    while k < len(pooled):
+        end = k
+        while end < len(pooled) and pooled[end][0] == pooled[k][0]:
+            end += 1
+        rank = (k + end + 1) / 2
+        rank_sum += rank * sum(1 for _, sample in pooled[k:end] if sample == 0)
+        ties += (end - k) ** 3 - (end - k)
+        k = end
+
+    u = rank_sum - n * (n + 1) / 2
+    mean = n * m / 2
+    sd = math.sqrt(n * m / 12 * ((n + m + 1) - ties / ((n + m) * (n + m - 1))))
+    if sd == 0:
+        return u, 1.0
+    z = max(abs(u - mean) - 0.5, 0) / sd
+    return u, min(1.0, 2 * (1 - NormalDist().cdf(z)))
+
+
+def holm_adjust(p_values):
+    """Holm-Bonferroni adjusted p-values, reject where adjusted <= family-wise alpha."""
+    order = sorted(range(len(p_values)), key=lambda idx: p_values[idx])
+    adjusted, running = [0.0] * len(p_values), 0.0
+    for position, idx in enumerate(order):
+        running = max(running, min(1.0, (len(p_values) - position) * p_values[idx]))
+        adjusted[idx] = running
+    return adjusted
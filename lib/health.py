@@ -1,6 +1,7 @@
 import random
 
 from lib.perscriptor import get_prescription_method
+from lib.random_streams import get_random
 from lib.observer import Observable, Events
 from lib.logger import Logger
 
@@ -13,6 +14,15 @@ def singleton(class_):
             instances[class_] = class_(*args, **kwargs)
         return instances[class_]
 
+    def reset():
+        instances.pop(class_, None)
+
+    def set(instance):
+        # Makes a copied instance (e.g. of a checkpoint) the singleton
+        instances[class_] = instance
+
+    get_instance.reset = reset
+    get_instance.set = set
     return get_instance
 
 
@@ -52,13 +62,13 @@ class DistrictLockdownPolicy(Policy):
     def __repr__(self):
         return '{}(p={:.2f}, max_dist={:.2f})'.format(self.__class__.__name__, self.strength, self.max_dist)
 
-    def try_move(self, old_pos, new_pos):
+    def try_move(self, old_pos, new_pos, rng=random):
         min_j, max_j, min_i, max_i = GlobalContext().canvas
         dx = (abs(old_pos[0] - new_pos[0]) / (max_j-min_j)) ** 2
         dy = (abs(old_pos[1] - new_pos[1]) / (max_i-min_i)) ** 2
         dist = (dx+dy) ** 0.5  # Movement distance normalized by canvas size
 
-        if random.random() > self.strength:
+        if rng.random() > self.strength:
             # Some people ignore restrictions...
             return True
         else:
@@ -67,19 +77,19 @@ class DistrictLockdownPolicy(Policy):
 
 
 class TotalLockdownPolicy(Policy):
-    def try_move(self, old_pos, new_pos):
+    def try_move(self, old_pos, new_pos, rng=random):
         # Government issue total lockdown policy.
         # Only the most brave (desperate, stupid?) people move during day time
         # P(movement) = 1 - policy_strength
-        return random.random() > self.strength
+        return rng.random() > self.strength
 
 
 class PPEPolicy(Policy):
-    def try_infect(self):
+    def try_infect(self, rng=random):
         # Government issue PPE usage policy (masks, gloves) which prevent infection.
         # But some people claims PPE are uncomfortable and don`t use it...?
         # P(infection) = 1 - policy_strength
-        return random.random() > self.strength
+        return rng.random() > self.strength
 
 
 class CombinedPolicy(Policy):
@@ -101,26 +111,42 @@ class CombinedPolicy(Policy):
         else:
             return False
 
-    def try_move(self):
+    def try_move(self, *args, **kwargs):
         # Assume that multiple policies gain total efficiency
         res = True
         for policy in self.policies:
-            res = res & policy.try_move()
+            res = res & policy.try_move(*args, **kwargs)
         return res
 
-    def try_infect(self):
+    def try_infect(self, *args, **kwargs):
         # Assume that multiple policies gain total efficiency
         res = True
         for policy in self.policies:
-            res = res & policy.try_infect()
+            res = res & policy.try_infect(*args, **kwargs)
         return res
 
 
+def decide_policy(policy, new_infections, new_recoveries, new_death, population):
+    decision = policy
+    if new_infections > 0.05 * population:
+        decision = PPEPolicy(0.8)
+
+    if new_recoveries > new_infections:
+        decision = Policy(0.0)
+
+    if new_death > 0.01 * population:
+        decision = TotalLockdownPolicy(0.7)
+
+    return decision
+
+
 @singleton
 class DepartmentOfHealth(Observable):
     def __init__(self, hospitals):
         super().__init__()
         self.hospitals = hospitals
+        # Optional lib.rolling.PolicyRuleEngine replacing decide_policy
+        self.rules = None
 
     def hospitalize(self, person):
         for hospital in self.hospitals:
@@ -133,21 +159,15 @@ class DepartmentOfHealth(Observable):
 
     def make_policy(self):
         decision = GlobalContext().policy
-        if len(GlobalContext().observer.infected_hist) > 0:
+        if self.rules is not None:
+            decision = self.rules.decide(decision, len(GlobalContext().persons))
+        elif len(GlobalContext().observer.infected_hist) > 0:
             # Collect statistics over all infections for the last day
             new_recoveries = sum(GlobalContext().observer.recovered_hist[-1].values())
             new_infections = sum(GlobalContext().observer.infected_hist[-1].values())
             new_death = sum(GlobalContext().observer.dead_hist[-1].values())
             population = len(GlobalContext().persons)
-            # Make decisions
-            if new_infections > 0.05 * population:
-                decision = PPEPolicy(0.8)
-
-            if new_recoveries > new_infections:
-                decision = Policy(0.0)
-
-            if new_death > 0.01 * population:
-                decision = TotalLockdownPolicy(0.7)
+            decision = decide_policy(decision, new_infections, new_recoveries, new_death, population)
 
         if decision != GlobalContext().policy:
             self.notify_observer(Events.EV_POLICY, decision)
@@ -163,6 +183,9 @@ class GlobalContext:
         self.health_dept = health_dept
         self.policy = Policy(0.0)
         self.observer = observer
+        self.phase_timings = {}
+        # Optional lib.schedule.Schedule moving the persons
+        self.schedule = None
 
 
 class Hospital:
@@ -180,7 +203,8 @@ class Hospital:
     def _treat_patient(self, patient):
         if patient.virus is not None:
             disease_type = patient.virus.get_type()
-            dose1, dose2 = random.random(), random.random()
+            rng = get_random('dose', patient.id)
+            dose1, dose2 = rng.random(), rng.random()
             prescription_method = get_prescription_method(disease_type, self.drug_repository, dose1, dose2)
             prescription_drugs = prescription_method.create_prescription()
 
@@ -0,0 +1,96 @@
+"""
+    Heterogeneous canvas: a population density raster and a table of venues.
+
+    Both are .npy files opened memory-mapped, so they are read from the page cache rather than copied
+    into the process (the alias table of homes reads the raster once). The density raster covers
+    the canvas, every raster cell is a block of
+    canvas positions. The venue table is a structured array with fields j, i and weight
+    (workplaces, schools, markets, ...), persons are assigned one venue and go there every day.
+"""
+import random
+from random import randint
+
+import numpy as np
+
+from lib.person import VenuePersonFactory
+
+VENUE_DTYPE = np.dtype([('j', np.int64), ('i', np.int64), ('weight', np.float64)])
+
+
+class AliasTable:
+    """Vose's alias method: O(n) construction, O(1) draws proportional to the weights."""
+
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=float).ravel()
+        if len(weights) == 0 or weights.sum() <= 0:
+            raise ValueError('weights must have a positive sum')
+        n = len(weights)
+        scaled = weights * n / weights.sum()
+        self.probability = np.ones(n)
+        self.alias = np.arange(n)
+
+        small = list(np.flatnonzero(scaled < 1.0))
+        large = list(np.flatnonzero(scaled >= 1.0))
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Leftovers are 1 up to rounding errors
+        self.n = n
+
+    def sample(self, rng=random):
+        column = int(rng.random() * self.n)
+        return column if rng.random() < self.probability[column] else int(self.alias[column])
+
+    def sample_many(self, generator, size):
+        """Vectorized draws with a numpy Generator."""
+        columns = generator.integers(0, self.n, size=size)
+        keep = generator.random(size) < self.probability[columns]
+        return np.where(keep, columns, self.alias[columns])
+
+
+def load_density(path):
+    return np.load(path, mmap_mode='r')
+
+
+def load_venues(path):
+    venues = np.load(path, mmap_mode='r')
+    if venues.dtype.names is None or not {'j', 'i', 'weight'} <= set(venues.dtype.names):
+        raise ValueError('venue table needs fields j, i and weight')
+    return venues
+
+
+class Landscape:
+    def __init__(self, canvas, density, venues):
+        self.canvas = canvas
+        self.density = density
+        self.venues = venues
+        self.homes = AliasTable(density)
+        self.venue_table = AliasTable(venues['weight'])
+
+    @classmethod
+    def load(cls, canvas, density_path, venues_path):
+        return cls(canvas, load_density(density_path), load_venues(venues_path))
+
+    def cell_bounds(self, cell):
+        # Canvas positions covered by a raster cell
+        min_j, max_j, min_i, max_i = self.canvas
+        rows, cols = self.density.shape
+        a, b = divmod(cell, cols)
+        span_j, span_i = max_j - min_j + 1, max_i - min_i + 1
+        return (min_j + a * span_j // rows, min_j + (a + 1) * span_j // rows - 1,
+                min_i + b * span_i // cols, min_i + (b + 1) * span_i // cols - 1)
+
+    def sample_home(self):
+        low_j, high_j, low_i, high_i = self.cell_bounds(self.homes.sample())
+        return randint(low_j, max(low_j, high_j)), randint(low_i, max(low_i, high_i))
+
+    def sample_venue(self):
+        venue = self.venues[self.venue_table.sample()]
+        return int(venue['j']), int(venue['i'])
+
+    def create_persons(self, n_persons):
+        factory = VenuePersonFactory(self)
+        return [factory.get_person() for _ in range(n_persons)]
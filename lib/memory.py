@@ -0,0 +1,199 @@
+"""
+    Memory accounting of a live simulation by subsystem.
+
+    Sizes are sys.getsizeof summed over the objects a subsystem owns: the traversal stops at the
+    objects of other subsystems (a hospital does not count its patients, a state not its person),
+    so the subsystems add up without double counting. Enum members, classes and functions are
+    shared and never counted. When tracemalloc is tracing, the report also attributes the traced
+    live allocations to the subsystems by allocation site, and it always records the resident set size.
+"""
+import ast
+import os
+import sys
+import tracemalloc
+from collections import deque
+from enum import Enum
+from types import FunctionType, ModuleType, BuiltinFunctionType, MethodType
+
+import pandas as pd
+
+from lib.logger import Logger
+
+SHARED_TYPES = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType, Enum)
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Subsystem of the allocations made by the code of (file, class), None stands for the rest of the file.
+# Containers are charged to the code growing them: patient lists to DepartmentOfHealth, antibody
+# sets to Person.
+ALLOCATION_SITES = {
+    ('basic_person.py', 'Person'): 'persons',
+    ('basic_person.py', None): 'states',
+    ('person.py', None): 'persons',
+    ('deseases.py', None): 'infectables',
+    ('health.py', 'Hospital'): 'hospitals',
+    ('health.py', 'DepartmentOfHealth'): 'patients',
+    ('drugs.py', None): 'hospitals',
+    ('perscriptor.py', None): 'hospitals',
+    ('observer.py', None): 'observer',
+    ('provenance.py', None): 'provenance',
+    ('logger.py', None): 'logger',
+}
+_class_ranges = {}
+
+
+def deep_sizeof(obj, seen):
+    """Size of obj and everything reachable from it which is not in seen, adds what it counts to seen."""
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if current is not obj and id(current) in seen or isinstance(current, SHARED_TYPES):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        if hasattr(current, '__dict__'):
+            stack.append(vars(current))
+        elif hasattr(current, '__slots__'):
+            stack.extend(getattr(current, name) for name in current.__slots__ if hasattr(current, name))
+    return size
+
+
+def resident_set_size():
+    """Current RSS in bytes, the peak RSS where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def enclosing_class(filename, lineno):
+    """Name of the top-level class whose body holds the line, None outside classes."""
+    if filename not in _class_ranges:
+        with open(filename) as source:
+            tree = ast.parse(source.read())
+        _class_ranges[filename] = [(node.lineno, node.end_lineno, node.name) for node in tree.body
+                                   if isinstance(node, ast.ClassDef)]
+    for first, last, name in _class_ranges[filename]:
+        if first <= lineno <= last:
+            return name
+    return None
+
+
+def traced_by_subsystem():
+    """
+        tracemalloc-attributed bytes per subsystem, by the package line which allocated them, see
+        ALLOCATION_SITES. Other lines of the package are counted as 'other'. Empty when tracemalloc
+        is not tracing.
+    """
+    if not tracemalloc.is_tracing():
+        return {}
+    result = {}
+    for stat in tracemalloc.take_snapshot().statistics('lineno'):
+        frame = stat.traceback[0]
+        if not frame.filename.startswith(PACKAGE_DIR) or frame.filename == __file__:
+            continue
+        module = os.path.relpath(frame.filename, PACKAGE_DIR)
+        owner = enclosing_class(frame.filename, frame.lineno)
+        subsystem = ALLOCATION_SITES.get((module, owner), ALLOCATION_SITES.get((module, None), 'other'))
+        result[subsystem] = result.get(subsystem, 0) + stat.size
+    return result
+
+
+def traced_by_file():
+    """tracemalloc-attributed bytes per file of the package, empty when tracemalloc is not tracing."""
+    if not tracemalloc.is_tracing():
+        return {}
+    result = {}
+    for stat in tracemalloc.take_snapshot().statistics('filename'):
+        filename = stat.traceback[0].filename
+        if filename.startswith(PACKAGE_DIR) and filename != __file__:
+            result[os.path.relpath(filename, os.path.dirname(PACKAGE_DIR))] = stat.size
+    return result
+
+
+class MemoryReport:
+    SUBSYSTEMS = ['persons', 'states', 'infectables', 'antibodies', 'hospitals', 'patients',
+                  'observer', 'provenance', 'logger']
+
+    def __init__(self, day, n_persons, subsystems, traced, rss):
+        self.day = day
+        self.n_persons = n_persons
+        self.subsystems = subsystems
+        self.traced = traced
+        self.rss = rss
+
+    def __repr__(self):
+        lines = ['{:<12}{:>14}'.format(name, size) for name, size in self.subsystems.items()]
+        lines.append('{:<12}{:>14}'.format('total', self.total))
+        lines.append('{:<12}{:>14}'.format('rss', self.rss))
+        return '\n'.join(lines)
+
+    @property
+    def total(self):
+        return sum(self.subsystems.values())
+
+    def bytes_per_agent(self, subsystems=None):
+        subsystems = self.SUBSYSTEMS if subsystems is None else subsystems
+        return sum(self.subsystems[name] for name in subsystems) / max(self.n_persons, 1)
+
+    def as_row(self):
+        row = {'day': self.day}
+        row.update(self.subsystems)
+        row['total'] = self.total
+        row['rss'] = self.rss
+        return row
+
+
+def memory_report(context):
+    """One-shot MemoryReport of a context of lib.simulation (GlobalContext)."""
+    persons, hospitals, observer = context.persons, context.health_dept.hospitals, context.observer
+    # Every subsystem stops at the objects owned by the others
+    seen = {id(obj) for obj in persons}
+    seen.update(id(obj) for obj in hospitals)
+    seen.update(id(obj) for obj in (context, context.health_dept, observer, Logger()))
+
+    subsystems = {
+        'states': sum(deep_sizeof(person.state, seen) for person in persons),
+        'infectables': sum(deep_sizeof(person.virus, seen) for person in persons if person.virus is not None),
+        'antibodies': sum(deep_sizeof(person.antibody_types, seen) for person in persons),
+        'patients': sum(deep_sizeof(hospital.patients, seen) for hospital in hospitals),
+        'provenance': deep_sizeof(observer.provenance, seen) if observer.provenance is not None else 0,
+    }
+    subsystems['persons'] = deep_sizeof(persons, seen) + sum(deep_sizeof(person, seen) for person in persons)
+    subsystems['hospitals'] = sum(deep_sizeof(hospital, seen) for hospital in hospitals)
+    subsystems['observer'] = deep_sizeof(observer, seen)
+    subsystems['logger'] = deep_sizeof(Logger(), seen)
+
+    ordered = {name: subsystems[name] for name in MemoryReport.SUBSYSTEMS}
+    return MemoryReport(observer.day, len(persons), ordered, traced_by_subsystem(), resident_set_size())
+
+
+def batch_bytes_per_agent(context):
+    """Bytes per agent of a lib.batch.BatchContext, all replicas included."""
+    return deep_sizeof(context, set()) / (context.n_replicas * context.n_persons)
+
+
+class MemoryMonitor:
+    """Observer listener taking a MemoryReport every `every` days."""
+
+    def __init__(self, context, every=1):
+        self.context = context
+        self.every = every
+        self.reports = []
+
+    def on_day_end(self, observer):
+        if observer.day % self.every == 0:
+            self.reports.append(memory_report(self.context))
+
+    def export_df(self):
+        return pd.DataFrame([report.as_row() for report in self.reports])
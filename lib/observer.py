@@ -1,7 +1,10 @@
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
+import numpy as np
 import pandas as pd
 from enum import Enum
 
+from lib.deseases import InfectableType
 from lib.logger import Logger
 
 
@@ -25,24 +28,128 @@ class Events(Enum):
     EV_HOSP_IN = 6
     EV_HOSP_OUT = 7
     EV_POLICY = 8
+    EV_TRANSMISSION = 9
+
+
+# Batched events are packed as event * EVENT_BASE + InfectableType value (0 without a type)
+EVENT_BASE = 16
+BATCHED_EVENTS = [Events.EV_INFECTION, Events.EV_DEATH, Events.EV_RECOVERY, Events.EV_ANTIBODY,
+                  Events.EV_HOSP_IN, Events.EV_HOSP_OUT]
+
+
+class Retention:
+    """
+        Keeps the last `window` days with daily resolution, older days are compacted into buckets
+        of `bucket` days. When there are more than max_buckets buckets, neighbours are merged and
+        the bucket length doubles, so the memory does not grow with the number of days.
+    """
+
+    def __init__(self, window=365, bucket=7, max_buckets=520):
+        self.window = window
+        self.bucket = bucket
+        self.max_buckets = max_buckets
+
+
+class Bucket:
+    def __init__(self, start):
+        self.start = start
+        self.days = 0
+        self.infected = defaultdict(int)
+        self.recovered = defaultdict(int)
+        self.ab = defaultdict(int)
+        self.dead = defaultdict(int)
+        self.hospitalized = 0
+        self.hospitalized_max = None
+        self.policies = defaultdict(int)
+
+    def add_day(self, infected, recovered, ab, dead, hospitalized, occupancy, policy):
+        for lst, day in [(self.infected, infected), (self.recovered, recovered), (self.ab, ab), (self.dead, dead)]:
+            for infection_type, value in day.items():
+                lst[infection_type] += value
+        self.hospitalized += hospitalized
+        self.hospitalized_max = occupancy if self.hospitalized_max is None else max(self.hospitalized_max, occupancy)
+        self.policies[policy] += 1
+        self.days += 1
+
+    def merge(self, other):
+        for lst in ['infected', 'recovered', 'ab', 'dead']:
+            for infection_type, value in getattr(other, lst).items():
+                getattr(self, lst)[infection_type] += value
+        self.hospitalized += other.hospitalized
+        if self.hospitalized_max is None or other.hospitalized_max > self.hospitalized_max:
+            self.hospitalized_max = other.hospitalized_max
+        for policy, days in other.policies.items():
+            self.policies[policy] += days
+        self.days += other.days
+
+    def copy(self):
+        bucket = Bucket(self.start)
+        bucket.merge(self)
+        return bucket
 
 
 class Observer:
-    def __init__(self, observables):
+    """
+        With batched=True the counter events (infection, death, recovery, antibody, hospital in/out)
+        are appended to a per-day buffer of packed ints and reduced into the counters with one
+        bincount at the day end, without per-event callbacks and log lines. Policy, transmission
+        and day end events always go through their callbacks.
+    """
+
+    def __init__(self, observables, retention=None, batched=False):
         self.observables = observables
         for obs in self.observables:
             obs.register_observer(self)
 
-        self.infected_hist = []
-        self.recovered_hist = []
-        self.ab_hist = []
-        self.dead_hist = []
-        self.hospitalized_hist = []
+        self.retention = retention
+        if retention is None:
+            self.infected_hist = []
+            self.recovered_hist = []
+            self.ab_hist = []
+            self.dead_hist = []
+            self.hospitalized_hist = []
+        else:
+            self.infected_hist = deque(maxlen=retention.window)
+            self.recovered_hist = deque(maxlen=retention.window)
+            self.ab_hist = deque(maxlen=retention.window)
+            self.dead_hist = deque(maxlen=retention.window)
+            self.hospitalized_hist = deque(maxlen=retention.window)
         self.policies = []
         self.day = 0
+        self.listeners = []
+        # Optional lib.provenance.ProvenanceLog recording who infected whom
+        self.provenance = None
+
+        self.handlers = {
+            Events.EV_DAY_END: self.notify_day_end,
+            Events.EV_DEATH: self.notify_death,
+            Events.EV_HOSP_IN: self.notify_hosp_in,
+            Events.EV_HOSP_OUT: self.notify_host_out,
+            Events.EV_RECOVERY: self.notify_recovery,
+            Events.EV_ANTIBODY: self.notify_antibody,
+            Events.EV_INFECTION: self.notify_infection,
+            Events.EV_POLICY: self.notify_policy,
+            Events.EV_TRANSMISSION: self.notify_transmission
+        }
+        self.batched = batched
+        self.batch_codes = {event: event.value * EVENT_BASE for event in BATCHED_EVENTS} if batched else {}
+        self.buffer = array('l')
+
+        # Compacted history, see Retention
+        # str(Policy(0.0)), the policy in force until the first EV_POLICY (lib.health imports this module)
+        self.policy = 'Policy(p=0.00)'
+        self.policy_hist = deque(maxlen=retention.window if retention else None)
+        self.buckets = []
+        self.bucket = None
+        self.bucket_size = retention.bucket if retention else 7
+        self.compacted_occupancy = 0
 
         self.reset()
 
+    def subscribe(self, listener):
+        # listener.on_day_end(observer) is called once the day is appended to the history
+        self.listeners.append(listener)
+
     def reset(self):
         self.infected = defaultdict(int)
         self.recovered = defaultdict(int)
@@ -50,7 +157,59 @@ class Observer:
         self.dead = defaultdict(int)
         self.hositalized = 0
 
+    def compact(self):
+        # Moves the oldest daily record into the buckets
+        self.compacted_occupancy += self.hospitalized_hist[0]
+        if self.bucket is None:
+            self.bucket = Bucket(self.day - len(self.dead_hist))
+        self.bucket.add_day(self.infected_hist[0], self.recovered_hist[0], self.ab_hist[0], self.dead_hist[0],
+                            self.hospitalized_hist[0], self.compacted_occupancy, self.policy_hist[0])
+
+        if self.bucket.days == self.bucket_size:
+            self.buckets.append(self.bucket)
+            self.bucket = None
+
+        if len(self.buckets) > self.retention.max_buckets:
+            merged = []
+            for i in range(0, len(self.buckets) - 1, 2):
+                self.buckets[i].merge(self.buckets[i + 1])
+                merged.append(self.buckets[i])
+            if len(self.buckets) % 2:
+                # The unpaired bucket is not full anymore and continues with the open one
+                if self.bucket is not None:
+                    self.buckets[-1].merge(self.bucket)
+                self.bucket = self.buckets[-1]
+            self.buckets = merged
+            self.bucket_size *= 2
+
+        first_day = self.day - len(self.dead_hist) + 1
+        while self.policies and self.policies[0][0] < first_day:
+            self.policies.pop(0)
+
+    def reduce_buffer(self):
+        # Adds the buffered events of the day to the counters
+        if not self.buffer:
+            return
+        counts = np.bincount(np.frombuffer(self.buffer, dtype=self.buffer.typecode))
+        self.buffer = array('l')
+        for code in np.flatnonzero(counts):
+            event, type_value = divmod(int(code), EVENT_BASE)
+            event, count = Events(event), int(counts[code])
+            if event == Events.EV_HOSP_IN:
+                self.hositalized += count
+            elif event == Events.EV_HOSP_OUT:
+                self.hositalized -= count
+            else:
+                counter = {Events.EV_INFECTION: self.infected, Events.EV_DEATH: self.dead,
+                           Events.EV_RECOVERY: self.recovered, Events.EV_ANTIBODY: self.ab}[event]
+                counter[InfectableType(type_value)] += count
+
     def day_finished(self):
+        self.reduce_buffer()
+        if self.retention is not None and len(self.dead_hist) == self.retention.window:
+            self.compact()
+
+        self.policy_hist.append(self.policy)
         self.infected_hist.append(self.infected)
         self.recovered_hist.append(self.recovered)
         self.ab_hist.append(self.ab)
@@ -59,6 +218,9 @@ class Observer:
         self.day += 1
         self.reset()
 
+        for listener in self.listeners:
+            listener.on_day_end(self)
+
     def infections_list(self):
         result = set()
         for lst in [self.infected_hist, self.recovered_hist, self.ab_hist, self.dead_hist]:
@@ -66,12 +228,72 @@ class Observer:
                 result.update(list(it.keys()))
         return list(result)
 
-    def export_df(self):
+    def aggregated_buckets(self):
+        # Compacted buckets followed by the daily records grouped into buckets of the same length
+        buckets = list(self.buckets)
+        bucket = self.bucket.copy() if self.bucket is not None else None
+        occupancy = self.compacted_occupancy
+        first_day = self.day - len(self.dead_hist)
+        records = zip(self.infected_hist, self.recovered_hist, self.ab_hist, self.dead_hist,
+                      self.hospitalized_hist, self.policy_hist)
+        for day, (infected, recovered, ab, dead, hospitalized, policy) in enumerate(records, first_day):
+            occupancy += hospitalized
+            if bucket is None:
+                bucket = Bucket(day)
+            bucket.add_day(infected, recovered, ab, dead, hospitalized, occupancy, policy)
+            if bucket.days == self.bucket_size:
+                buckets.append(bucket)
+                bucket = None
+        if bucket is not None:
+            buckets.append(bucket)
+        return buckets
+
+    def export_aggregated_df(self):
+        buckets = self.aggregated_buckets()
+        infections_lst = set()
+        for bucket in buckets:
+            for lst in ['infected', 'recovered', 'ab', 'dead']:
+                infections_lst.update(getattr(bucket, lst).keys())
+        infections_lst = list(infections_lst)
+
+        res = {
+            'day': [b.start for b in buckets],
+            'days': [b.days for b in buckets],
+            'hospitalized': [b.hospitalized for b in buckets],
+            'hospitalized_max': [b.hospitalized_max for b in buckets],
+            'policy': [max(b.policies, key=b.policies.get) for b in buckets],
+            # Days under every policy, transitions older than the daily window survive only here
+            'policies': [dict(b.policies) for b in buckets],
+        }
+
+        fmt = lambda x: x.name
+        for lst in ['infected', 'recovered', 'ab', 'dead']:
+            for infection_type in infections_lst:
+                res[lst+'_'+fmt(infection_type)] = [getattr(b, lst).get(infection_type, 0) for b in buckets]
+
+        res = pd.DataFrame(res)
+
+        for lst in ['infected', 'recovered', 'ab', 'dead']:
+            res[lst+'_all'] = sum([res[lst+'_'+fmt(inf_type)] for inf_type in infections_lst])
+
+        return res
+
+    def export_df(self, resolution='daily'):
+        """
+            resolution='daily' exports the days kept with daily resolution (all days without retention),
+            resolution='aggregated' exports the whole run in buckets, see Retention. Its policy column is
+            the dominant policy of a bucket, policies maps every policy in force to its number of days.
+        """
+        if resolution == 'aggregated':
+            return self.export_aggregated_df()
+        elif resolution != 'daily':
+            raise ValueError('Unknown resolution ' + str(resolution))
+
         infections_lst = self.infections_list()
 
         res = {
-            'day': list(range(len(self.dead_hist))),
-            'hospitalized': self.hospitalized_hist,
+            'day': list(range(self.day - len(self.dead_hist), self.day)),
+            'hospitalized': list(self.hospitalized_hist),
         }
 
         fmt = lambda x: x.name
@@ -87,19 +309,20 @@ class Observer:
         return res
 
     def notify(self, event_type, *args, **kwargs):
-        {
-            Events.EV_DAY_END: self.notify_day_end,
-            Events.EV_DEATH: self.notify_death,
-            Events.EV_HOSP_IN: self.notify_hosp_in,
-            Events.EV_HOSP_OUT: self.notify_host_out,
-            Events.EV_RECOVERY: self.notify_recovery,
-            Events.EV_ANTIBODY: self.notify_antibody,
-            Events.EV_INFECTION: self.notify_infection,
-            Events.EV_POLICY: self.notify_policy
-        }[event_type](*args, **kwargs)
+        code = self.batch_codes.get(event_type)
+        if code is None:
+            self.handlers[event_type](*args, **kwargs)
+        else:
+            self.buffer.append(code + args[0].value if args else code)
 
     def notify_policy(self, policy):
         self.policies.append((self.day, str(policy)))
+        self.policy = str(policy)
+
+    def notify_transmission(self, person, source, infection_type, *args, **kwargs):
+        if self.provenance is not None:
+            self.provenance.append(self.day, source.id if source is not None else -1, person.id,
+                                   person.position, infection_type)
 
     def notify_day_end(self, *args, **kwargs):
         Logger().log('Observer', '-' * 20 + ' Day end ' + '-' * 20)
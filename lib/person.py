@@ -3,14 +3,24 @@ from abc import ABC, abstractmethod
 
 from lib.basic_person import Person
 from lib.health import GlobalContext
+from lib.random_streams import get_random
+
+
+def scheduled_move(person):
+    # Moves the person by GlobalContext().schedule (lib.schedule.Schedule) if there is one
+    schedule = GlobalContext().schedule
+    return schedule is not None and schedule.move(person)
 
 
 class DefaultPerson(Person):
     def _day_actions(self):
+        if scheduled_move(self):
+            return
         min_j, max_j, min_i, max_i = GlobalContext().canvas
-        new_position = (randint(min_j, max_j), randint(min_i, max_i))
+        rng = get_random('move', self.id)
+        new_position = (rng.randint(min_j, max_j), rng.randint(min_i, max_i))
 
-        if GlobalContext().policy.try_move(self.position, new_position):
+        if GlobalContext().policy.try_move(self.position, new_position, rng=rng):
             self.position = new_position
 
 
@@ -25,10 +35,29 @@ class CommunityPerson(Person):
         return basic_attrs
 
     def _day_actions(self):
-        if GlobalContext().policy.try_move(self.position, self.community_position):
+        if scheduled_move(self):
+            return
+        if GlobalContext().policy.try_move(self.position, self.community_position, rng=get_random('move', self.id)):
             self.position = self.community_position
 
 
+class VenuePerson(Person):
+    def __init__(self, venue_position=(0, 0), **kwargs):
+        super().__init__(**kwargs)
+        self.venue_position = venue_position
+
+    def attrs(self):
+        basic_attrs = super(VenuePerson, self).attrs()
+        basic_attrs['venue'] = self.venue_position
+        return basic_attrs
+
+    def _day_actions(self):
+        if scheduled_move(self):
+            return
+        if GlobalContext().policy.try_move(self.position, self.venue_position, rng=get_random('move', self.id)):
+            self.position = self.venue_position
+
+
 class AbstractPersonFactory(ABC):
     def __init__(self, context):
         self.min_age, self.max_age = 1, 90
@@ -61,3 +90,17 @@ class CommunityPersonFactory(AbstractPersonFactory):
             weight=randint(self.min_weight, self.max_weight),
             community_position=self.community_position
         )
+
+
+class VenuePersonFactory(AbstractPersonFactory):
+    def __init__(self, landscape):
+        super().__init__(landscape.canvas)
+        self.landscape = landscape
+
+    def get_person(self) -> Person:
+        return VenuePerson(
+            home_position=self.landscape.sample_home(),
+            age=randint(self.min_age, self.max_age),
+            weight=randint(self.min_weight, self.max_weight),
+            venue_position=self.landscape.sample_venue(),
+        )
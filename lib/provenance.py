@@ -0,0 +1,130 @@
+"""
+    Infection provenance: who infected whom, where and when.
+
+    Records are appended to typed arrays (array.array), one column per field, so an append is
+    amortized O(1) and a record takes a few dozen bytes. Queries convert the columns to numpy.
+"""
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from lib.deseases import InfectableType
+
+COLUMNS = ['day', 'infector', 'infectee', 'cell_j', 'cell_i', 'virus']
+
+
+class ProvenanceLog:
+    """
+        Attach it as Observer.provenance (or pass to lib.simulation.initialize).
+        Initial infections have infector -1. virus keeps InfectableType values.
+    """
+
+    def __init__(self):
+        self.day = array('l')
+        self.infector = array('q')
+        self.infectee = array('q')
+        self.cell_j = array('l')
+        self.cell_i = array('l')
+        self.virus = array('b')
+
+    def __len__(self):
+        return len(self.day)
+
+    def append(self, day, infector, infectee, cell, infection_type):
+        self.day.append(day)
+        self.infector.append(infector)
+        self.infectee.append(infectee)
+        self.cell_j.append(int(cell[0]))
+        self.cell_i.append(int(cell[1]))
+        self.virus.append(infection_type.value)
+
+    def columns(self):
+        return {name: np.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)
+                if len(self) else np.zeros(0, dtype=getattr(self, name).typecode) for name in COLUMNS}
+
+    def to_df(self):
+        df = pd.DataFrame(self.columns())
+        df['virus'] = [InfectableType(v).name for v in df['virus']]
+        return df
+
+    def to_npz(self, path):
+        np.savez_compressed(path, **self.columns())
+
+    def to_parquet(self, path):
+        """Needs the optional pyarrow (or fastparquet) package, see README."""
+        self.to_df().to_parquet(path)
+
+    @classmethod
+    def from_npz(cls, path):
+        log = cls()
+        with np.load(path) as data:
+            for name in COLUMNS:
+                getattr(log, name).extend(data[name].tolist())
+        return log
+
+    def parents(self):
+        """Row of the infection which passed the virus for every record, -1 for roots."""
+        columns = self.columns()
+        n, n_types = len(self), len(InfectableType) + 1
+        rows = np.arange(n, dtype=np.int64)
+
+        # The infector's latest infection with the same virus before the record
+        keys = columns['infectee'] * n_types + columns['virus']
+        order = np.lexsort((rows, keys))
+        composite = keys[order] * (n + 1) + rows[order]
+        query = (columns['infector'] * n_types + columns['virus']) * (n + 1) + rows
+        found = np.searchsorted(composite, query) - 1
+
+        parents = np.full(n, -1, dtype=np.int64)
+        valid = (columns['infector'] >= 0) & (found >= 0)
+        candidates = order[np.maximum(found, 0)]
+        valid &= keys[candidates] == columns['infector'] * n_types + columns['virus']
+        parents[valid] = candidates[valid]
+        return parents
+
+    def generations(self):
+        """Generation of every record: 0 for initial infections (and infectors missing from the log)."""
+        ancestor = self.parents()
+        generation = (ancestor >= 0).astype(np.int64)
+        # Pointer jumping, O(n log depth)
+        while np.any(ancestor >= 0):
+            linked = ancestor >= 0
+            next_generation = generation.copy()
+            next_generation[linked] += generation[ancestor[linked]]
+            next_ancestor = np.full_like(ancestor, -1)
+            next_ancestor[linked] = ancestor[ancestor[linked]]
+            generation, ancestor = next_generation, next_ancestor
+        return generation
+
+    def secondary_cases(self):
+        """Number of infections caused by every record."""
+        parents = self.parents()
+        return np.bincount(parents[parents >= 0], minlength=len(self))
+
+    def secondary_distribution(self):
+        """Number of infections having caused 0, 1, 2, ... secondary cases."""
+        return np.bincount(self.secondary_cases())
+
+    def reproduction_numbers(self):
+        """
+            Mean number of secondary cases per generation.
+            The latest generations are still infectious, so their numbers are underestimated.
+        """
+        generation, secondary = self.generations(), self.secondary_cases()
+        counts = np.bincount(generation)
+        result = pd.DataFrame({
+            'generation': np.arange(len(counts)),
+            'cases': counts,
+            'secondary': np.bincount(generation, weights=secondary, minlength=len(counts)).astype(np.int64),
+        })
+        result['R'] = result['secondary'] / result['cases']
+        return result[result['cases'] > 0].reset_index(drop=True)
+
+    def superspreading_cells(self, top=10):
+        """Cells with the largest number of transmissions, initial infections excluded."""
+        columns = self.columns()
+        transmitted = columns['infector'] >= 0
+        df = pd.DataFrame({'cell_j': columns['cell_j'][transmitted], 'cell_i': columns['cell_i'][transmitted]})
+        counts = df.groupby(['cell_j', 'cell_i']).size().rename('infections').reset_index()
+        return counts.sort_values('infections', ascending=False, kind='stable').head(top).reset_index(drop=True)
@@ -0,0 +1,41 @@
+"""
+    Per-agent, per-day random streams for common random numbers.
+
+    By default get_random returns the global random module, so the simulation draws exactly the same
+    numbers as before. With RandomStreams installed, every (purpose, agent, day) has its own stream,
+    so two runs of different scenarios draw the same numbers for the same agent on the same day.
+"""
+import random
+
+_streams = None
+
+
+class RandomStreams:
+    def __init__(self, seed):
+        self.seed = seed
+        self.day = 0
+        self.streams = {}
+
+    def get(self, purpose, key):
+        stream = self.streams.get((purpose, key))
+        if stream is None:
+            stream = random.Random('{}/{}/{}/{}'.format(self.seed, purpose, key, self.day))
+            self.streams[(purpose, key)] = stream
+        return stream
+
+    def on_day_end(self, observer):
+        # Subscribed to the Observer, streams of the finished day are dropped
+        self.day = observer.day
+        self.streams = {}
+
+
+def use_streams(streams):
+    """Installs RandomStreams for get_random, None restores the global random module."""
+    global _streams
+    _streams = streams
+
+
+def get_random(purpose, key):
+    if _streams is None:
+        return random
+    return _streams.get(purpose, key)
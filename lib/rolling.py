@@ -0,0 +1,165 @@
+"""
+    Rolling-window statistics over the Observer history and policy rules reading from them.
+
+    RollingStatistics is subscribed to an Observer and updated once per day end in constant time,
+    so rules may look at weekly sums, growth rates or the total hospital occupancy however long the
+    run is.
+"""
+from collections import deque
+
+from lib.deseases import InfectableType
+from lib.health import Policy, PPEPolicy, TotalLockdownPolicy
+
+
+class RollingWindow:
+    """Sums of the last `window` values and of the `window` values before them."""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=2 * window)
+        self.current = 0
+        self.previous = 0
+
+    def push(self, value):
+        if len(self.values) == self.values.maxlen:
+            self.previous -= self.values[0]
+        if len(self.values) >= self.window:
+            leaving = self.values[-self.window]
+            self.current -= leaving
+            self.previous += leaving
+        self.values.append(value)
+        self.current += value
+
+    def last(self):
+        return self.values[-1] if self.values else 0
+
+    def sum(self):
+        return self.current
+
+    def mean(self):
+        n = min(len(self.values), self.window)
+        return self.current / n if n else 0.0
+
+    def growth_rate(self):
+        # Relative change of the window sum against the previous window
+        if self.previous > 0:
+            return self.current / self.previous - 1.0
+        return float('inf') if self.current > 0 else 0.0
+
+
+class RollingStatistics:
+    """
+        Windows of every metric in total and per InfectableType. Hospital occupancy is windowed in
+        total only, the Observer does not count hospitalizations by type.
+    """
+
+    METRICS = ['infected', 'recovered', 'ab', 'dead']
+
+    def __init__(self, window=7):
+        self.window = window
+        self.days = 0
+        self.totals = {metric: RollingWindow(window) for metric in self.METRICS}
+        # Every type from day 0, so a type appearing late still averages over the whole window
+        self.by_type = {metric: {infection_type: RollingWindow(window) for infection_type in InfectableType}
+                        for metric in self.METRICS}
+        self.occupancy = 0
+        self.occupancy_window = RollingWindow(window)
+
+    def on_day_end(self, observer):
+        for metric in self.METRICS:
+            day = getattr(observer, metric + '_hist')[-1]
+            self.totals[metric].push(sum(day.values()))
+
+            for infection_type, window in self.by_type[metric].items():
+                window.push(day.get(infection_type, 0))
+
+        self.occupancy += observer.hospitalized_hist[-1]
+        self.occupancy_window.push(self.occupancy)
+        self.days += 1
+
+    def get(self, metric, infection_type=None):
+        """RollingWindow of the metric ('infected', 'recovered', 'ab', 'dead' or 'occupancy')."""
+        if metric == 'occupancy':
+            return self.occupancy_window
+        if infection_type is None:
+            return self.totals[metric]
+        return self.by_type[metric][infection_type]
+
+    def occupancy_trend(self):
+        # Average daily change of the hospital occupancy over the window
+        values = self.occupancy_window.values
+        if len(values) < 2:
+            return 0.0
+        span = min(len(values) - 1, self.window)
+        return (values[-1] - values[-1 - span]) / span
+
+
+class Threshold:
+    """Condition `stat of metric > value`, value is a share of the population when per_capita is set."""
+
+    def __init__(self, metric, stat, value, per_capita=True, infection_type=None):
+        self.metric = metric
+        self.stat = stat
+        self.value = value
+        self.per_capita = per_capita
+        self.infection_type = infection_type
+
+    def __repr__(self):
+        return 'Threshold({}.{} > {}{})'.format(self.metric, self.stat, self.value,
+                                                 ' * population' if self.per_capita else '')
+
+    def __call__(self, stats, population):
+        value = getattr(stats.get(self.metric, self.infection_type), self.stat)()
+        return value > (self.value * population if self.per_capita else self.value)
+
+
+class Exceeds:
+    """Condition `stat of metric > stat of other metric`."""
+
+    def __init__(self, metric, other, stat='last'):
+        self.metric = metric
+        self.other = other
+        self.stat = stat
+
+    def __repr__(self):
+        return 'Exceeds({0}.{2} > {1}.{2})'.format(self.metric, self.other, self.stat)
+
+    def __call__(self, stats, population):
+        return getattr(stats.get(self.metric), self.stat)() > getattr(stats.get(self.other), self.stat)()
+
+
+class PolicyRule:
+    def __init__(self, condition, policy):
+        self.condition = condition
+        self.policy = policy
+
+    def __repr__(self):
+        return 'PolicyRule({} -> {})'.format(self.condition, self.policy)
+
+
+class PolicyRuleEngine:
+    """
+        Decides the policy from RollingStatistics. Rules are checked in order and the last
+        matching one wins; without matches the current policy is kept.
+        Set it as DepartmentOfHealth.rules to replace the built-in decision.
+    """
+
+    def __init__(self, stats, rules):
+        self.stats = stats
+        self.rules = rules
+
+    def decide(self, policy, population):
+        decision = policy
+        for rule in self.rules:
+            if rule.condition(self.stats, population):
+                decision = rule.policy
+        return decision
+
+
+def default_rules():
+    """The rules of lib.health.decide_policy."""
+    return [
+        PolicyRule(Threshold('infected', 'last', 0.05), PPEPolicy(0.8)),
+        PolicyRule(Exceeds('recovered', 'infected'), Policy(0.0)),
+        PolicyRule(Threshold('dead', 'last', 0.01), TotalLockdownPolicy(0.7)),
+    ]
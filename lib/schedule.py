@@ -0,0 +1,173 @@
+"""
+    Daily movement schedule: all destinations of a day are sampled in one batched numpy call.
+
+    Persons go out from home in the morning, so the options of every agent are known in advance:
+    a uniform destination on the canvas (DefaultPerson) or a fixed one (community and venue persons).
+    A movement kernel describes the policy as the probability to accept a move inside and outside
+    the district around home. It and the district candidate sets are cached until the policy
+    changes, and rejected moves are never drawn: inside destinations are sampled from the
+    district offsets, outside ones from the rest of the canvas.
+
+    The moves follow the same distribution as Person._day_actions with Policy.try_move but use
+    their own numpy generator. Set it as GlobalContext().schedule to use it.
+"""
+import math
+import random
+
+import numpy as np
+
+from lib.health import GlobalContext, Policy, DistrictLockdownPolicy, TotalLockdownPolicy, PPEPolicy, CombinedPolicy
+from lib.person import DefaultPerson, CommunityPerson, VenuePerson
+
+
+class MovementKernel:
+    """P(move accepted) inside the district of normalized radius `radius` and outside it."""
+
+    def __init__(self, radius=None, inside=1.0, outside=1.0):
+        self.radius = radius
+        self.inside = inside
+        self.outside = outside
+
+
+def movement_kernel(policy):
+    """MovementKernel of a policy, None for policies it can not describe."""
+    kernel = MovementKernel()
+    for part in (policy.policies if isinstance(policy, CombinedPolicy) else [policy]):
+        if isinstance(part, DistrictLockdownPolicy):
+            if kernel.radius is not None:
+                return None
+            kernel.radius = part.max_dist
+            kernel.outside *= 1.0 - part.strength
+        elif isinstance(part, TotalLockdownPolicy):
+            kernel.inside *= 1.0 - part.strength
+            kernel.outside *= 1.0 - part.strength
+        elif not isinstance(part, PPEPolicy) and type(part) is not Policy:
+            return None
+    return kernel
+
+
+class Schedule:
+    def __init__(self, context, seed=None):
+        self.canvas = context.canvas
+        self.generator = np.random.default_rng(random.getrandbits(64) if seed is None else seed)
+
+        scheduled = [person for person in context.persons
+                     if isinstance(person, (DefaultPerson, CommunityPerson, VenuePerson))]
+        self.rows = {person.id: row for row, person in enumerate(scheduled)}
+        self.home = np.array([person.home_position for person in scheduled], dtype=np.int64).reshape(-1, 2)
+        self.roaming = np.array([isinstance(person, DefaultPerson) for person in scheduled], dtype=bool)
+        self.target = np.array([getattr(person, 'venue_position', getattr(person, 'community_position', (0, 0)))
+                                for person in scheduled], dtype=np.int64).reshape(-1, 2)
+
+        self.policy = None
+        self.kernel = None
+        self.offsets = None
+        self.n_inside = None
+        self.target_probability = None
+        self.day = None
+        self.destinations = None
+
+    def distance(self, a, b):
+        # Normalized like DistrictLockdownPolicy.try_move
+        min_j, max_j, min_i, max_i = self.canvas
+        dx = ((a[..., 0] - b[..., 0]) / (max_j - min_j)) ** 2
+        dy = ((a[..., 1] - b[..., 1]) / (max_i - min_i)) ** 2
+        return (dx + dy) ** 0.5
+
+    def update_policy(self, policy):
+        self.policy = policy
+        self.kernel = movement_kernel(policy)
+        if self.kernel is None:
+            return
+
+        radius = self.kernel.radius
+        inside = self.distance(self.home, self.target) < radius if radius is not None else np.ones(len(self.home), bool)
+        self.target_probability = np.where(inside, self.kernel.inside, self.kernel.outside)
+
+        if radius is None:
+            self.offsets, self.n_inside = None, None
+            return
+        # Offsets of the district, the same for every home up to the canvas border
+        min_j, max_j, min_i, max_i = self.canvas
+        reach_j, reach_i = math.ceil(radius * (max_j - min_j)), math.ceil(radius * (max_i - min_i))
+        grid = np.stack(np.meshgrid(np.arange(-reach_j, reach_j + 1), np.arange(-reach_i, reach_i + 1),
+                                    indexing='ij'), axis=-1).reshape(-1, 2)
+        self.offsets = grid[self.distance(grid, np.zeros(2)) < radius]
+
+        # District sizes: per row of offsets the columns form an interval clipped by the canvas
+        self.n_inside = np.zeros(len(self.home), dtype=np.int64)
+        for dj in np.unique(self.offsets[:, 0]):
+            half = self.offsets[self.offsets[:, 0] == dj, 1].max()
+            j = self.home[:, 0] + dj
+            low = np.maximum(self.home[:, 1] - half, min_i)
+            high = np.minimum(self.home[:, 1] + half, max_i)
+            self.n_inside += np.where((j >= min_j) & (j <= max_j), np.maximum(high - low + 1, 0), 0)
+
+    def uniform(self, n):
+        min_j, max_j, min_i, max_i = self.canvas
+        return np.stack([self.generator.integers(min_j, max_j, size=n, endpoint=True),
+                         self.generator.integers(min_i, max_i, size=n, endpoint=True)], axis=-1)
+
+    def in_canvas(self, positions):
+        min_j, max_j, min_i, max_i = self.canvas
+        return (positions[:, 0] >= min_j) & (positions[:, 0] <= max_j) & \
+               (positions[:, 1] >= min_i) & (positions[:, 1] <= max_i)
+
+    def sample_inside(self, homes):
+        # Uniform over the district offsets which stay on the canvas
+        result = np.empty_like(homes)
+        pending = np.arange(len(homes))
+        while len(pending):
+            candidates = homes[pending] + self.offsets[self.generator.integers(len(self.offsets), size=len(pending))]
+            valid = self.in_canvas(candidates)
+            result[pending[valid]] = candidates[valid]
+            pending = pending[~valid]
+        return result
+
+    def sample_outside(self, homes):
+        # Uniform over the canvas outside the district
+        result = np.empty_like(homes)
+        pending = np.arange(len(homes))
+        while len(pending):
+            candidates = self.uniform(len(pending))
+            valid = self.distance(homes[pending], candidates) >= self.kernel.radius
+            result[pending[valid]] = candidates[valid]
+            pending = pending[~valid]
+        return result
+
+    def plan(self):
+        n = len(self.home)
+        u = self.generator.random(n)
+        going = (u < self.target_probability) & ~self.roaming
+        destinations = np.where(going[:, None], self.target, self.home)
+
+        roaming = np.flatnonzero(self.roaming)
+        if self.kernel.radius is None:
+            moving = roaming[u[roaming] < self.kernel.inside]
+            destinations[moving] = self.uniform(len(moving))
+        else:
+            min_j, max_j, min_i, max_i = self.canvas
+            share = self.n_inside[roaming] / ((max_j - min_j + 1) * (max_i - min_i + 1))
+            p_inside = share * self.kernel.inside
+            p_outside = (1.0 - share) * self.kernel.outside
+            inside = roaming[u[roaming] < p_inside]
+            outside = roaming[(u[roaming] >= p_inside) & (u[roaming] < p_inside + p_outside)]
+            destinations[inside] = self.sample_inside(self.home[inside])
+            destinations[outside] = self.sample_outside(self.home[outside])
+        self.destinations = destinations.tolist()
+
+    def move(self, person):
+        """Moves a scheduled person to the destination of the day, False when the person is not scheduled."""
+        context = GlobalContext()
+        if self.day != context.observer.day:
+            if context.policy != self.policy:
+                self.update_policy(context.policy)
+            self.day = context.observer.day
+            if self.kernel is not None:
+                self.plan()
+
+        row = self.rows.get(person.id)
+        if row is None or self.kernel is None:
+            return False
+        person.position = tuple(self.destinations[row])
+        return True
@@ -0,0 +1,476 @@
+"""
+    Multi-process simulation with spatial domain decomposition.
+
+    The canvas is split into tiles, one worker process per tile. Agents live in shared memory as
+    flat arrays (the layout of lib.batch with a single replica), so no agent data is copied between
+    processes. Every agent has two owners:
+    - the home tile owner runs its day and night actions,
+    - the current tile owner resolves its contacts. After the movement every worker writes the
+      residents which left its tile, grouped by destination tile, into its slice of a shared
+      hand-over buffer; the destination owners read only their segments, so the daily work of a
+      worker is proportional to its residents and visitors, not to the population.
+    Infectors are counted on a shared canvas grid; every worker writes its own tile and reads a halo
+    of the contact distance around it. A community position outside the canvas belongs to the tile
+    of the nearest canvas cell, whose grid block is extended to cover it. The coordinator (calling
+    process) runs the DepartmentOfHealth part: policy decisions, treatment and hospitalization, with
+    counters reduced over all workers.
+
+    Like lib.batch the engine is statistically, not bitwise, equivalent to the object engine.
+"""
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from threading import BrokenBarrierError
+
+import numpy as np
+
+from lib.basic_person import Person, AsymptomaticSick
+from lib.batch import (INFECTION_TYPES, HEALTHY, ASYMPTOMATIC, SYMPTOMATIC, DEAD, RATE, FEVER, DEHYDRATION,
+                       TREATS_FEVER, ASPIRIN_EFFICIENCY, GLUCOSE_EFFICIENCY, ANTIVIRUS_EFFICIENCY, NORMAL_TEMPERATURE,
+                       encode_policy, contact_stencil, neighbour_sum, try_move, infection_probability, choose_infection)
+from lib.health import Policy, decide_policy
+from lib.observer import Observer
+
+C_INFECTED, C_RECOVERED, C_DEAD, C_HOSP_OUT = 0, 1, 2, 3
+CONTROL_KIND, CONTROL_STRENGTH, CONTROL_MAX_DIST = 0, 1, 2
+
+
+def shared_layout(n_persons, n_workers, grid_bounds):
+    min_j, max_j, min_i, max_i = grid_bounds
+    n_types = len(INFECTION_TYPES)
+    return {
+        'home': ((n_persons, 2), np.int32),
+        'position': ((n_persons, 2), np.int32),
+        'community': ((n_persons,), bool),
+        'age': ((n_persons,), np.float64),
+        'weight': ((n_persons,), np.float64),
+        'temperature': ((n_persons,), np.float64),
+        'water': ((n_persons,), np.float64),
+        'state': ((n_persons,), np.int8),
+        'virus': ((n_persons,), np.int8),
+        'strength': ((n_persons,), np.float64),
+        'days_sick': ((n_persons,), np.int32),
+        'antibodies': ((n_persons, n_types), bool),
+        'hospital': ((n_persons,), np.int32),
+        'candidate': ((n_persons,), bool),
+        'residents': ((n_persons,), np.int64),
+        'resident_offsets': ((n_workers + 1,), np.int64),
+        'handover': ((n_persons,), np.int64),
+        'handover_counts': ((n_workers, n_workers), np.int64),
+        'grid': ((n_types, max_j - min_j + 1, max_i - min_i + 1), np.int32),
+        'counters': ((n_workers, 4, n_types), np.int64),
+        'control': ((3,), np.float64),
+    }
+
+
+class SharedArrays:
+    """Numpy arrays backed by named shared memory blocks. Without names the blocks are created."""
+
+    def __init__(self, layout, names=None):
+        self.owner = names is None
+        self.blocks = {}
+        self.arrays = {}
+        for key, (shape, dtype) in layout.items():
+            size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            if self.owner:
+                block = SharedMemory(create=True, size=size)
+            else:
+                block = SharedMemory(name=names[key])
+            self.blocks[key] = block
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            if self.owner:
+                self.arrays[key].fill(0)
+
+    def __getattr__(self, key):
+        try:
+            return self.__dict__['arrays'][key]
+        except KeyError:
+            raise AttributeError(key)
+
+    @property
+    def names(self):
+        return {key: block.name for key, block in self.blocks.items()}
+
+    def close(self):
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self.blocks = {}
+
+
+def tile_bounds(canvas, tiles):
+    min_j, max_j, min_i, max_i = canvas
+    return (np.linspace(min_j, max_j + 1, tiles[0] + 1).astype(int),
+            np.linspace(min_i, max_i + 1, tiles[1] + 1).astype(int))
+
+
+def split_canvas(canvas, tiles):
+    """Splits the canvas cells into tiles[0] x tiles[1] rectangles (min_j, max_j, min_i, max_i)."""
+    bounds_j, bounds_i = tile_bounds(canvas, tiles)
+    return [(int(bounds_j[a]), int(bounds_j[a + 1]) - 1, int(bounds_i[b]), int(bounds_i[b + 1]) - 1)
+            for a in range(tiles[0]) for b in range(tiles[1])]
+
+
+def tile_index(positions, canvas, tiles):
+    """Tile of every position, positions outside the canvas go to the tile of the nearest cell."""
+    min_j, max_j, min_i, max_i = canvas
+    bounds_j, bounds_i = tile_bounds(canvas, tiles)
+    a = np.searchsorted(bounds_j, np.clip(positions[:, 0], min_j, max_j), side='right') - 1
+    b = np.searchsorted(bounds_i, np.clip(positions[:, 1], min_i, max_i), side='right') - 1
+    return a * tiles[1] + b
+
+
+def grid_bounds(canvas, community_position):
+    # The contact grid also covers a community position outside the canvas, see lib.batch
+    min_j, max_j, min_i, max_i = canvas
+    return (min(min_j, community_position[0]), max(max_j, community_position[0]),
+            min(min_i, community_position[1]), max(max_i, community_position[1]))
+
+
+class TileWorker:
+    """
+        tile is the grid block of the worker, canvas and tiles the decomposition, grid the bounds of
+        the shared contact grid. seed is a numpy SeedSequence.
+    """
+
+    def __init__(self, shared, worker_id, tile, canvas, tiles, grid, community_position, seed):
+        self.shared = shared
+        self.worker_id = worker_id
+        self.tile = tile
+        self.canvas = canvas
+        self.tiles = tiles
+        self.grid = grid
+        self.community_position = np.array(community_position, dtype=np.int32)
+        self.rng = np.random.default_rng(seed)
+        self.stencil = contact_stencil(canvas)
+        self.counters = shared.counters[worker_id]
+        offsets = shared.resident_offsets
+        self.offset = int(offsets[worker_id])
+        self.residents = np.array(shared.residents[offsets[worker_id]:offsets[worker_id + 1]])
+        self.staying = None
+        self.visitors = None
+
+    def policy(self):
+        control = self.shared.control
+        return int(control[CONTROL_KIND]), control[CONTROL_STRENGTH], control[CONTROL_MAX_DIST]
+
+    def count(self, persons, row):
+        self.counters[row] += np.bincount(self.shared.virus[persons], minlength=len(INFECTION_TYPES))
+
+    def release(self, persons):
+        released = persons[self.shared.hospital[persons] >= 0]
+        self.shared.hospital[released] = -1
+        self.counters[C_HOSP_OUT, 0] += len(released)
+
+    def day_actions(self):
+        s, persons = self.shared, self.residents
+        state = s.state[persons]
+        asymptomatic, symptomatic = persons[state == ASYMPTOMATIC], persons[state == SYMPTOMATIC]
+
+        movers = persons[(state == HEALTHY) | (state == ASYMPTOMATIC)]
+        min_j, max_j, min_i, max_i = self.canvas
+        destination = self.rng.integers([min_j, min_i], [max_j, max_i], size=(len(movers), 2), endpoint=True)
+        destination[s.community[movers]] = self.community_position
+        kind, strength, max_dist = self.policy()
+        allowed = try_move(self.rng, kind, strength, max_dist, s.position[movers], destination, self.canvas)
+        s.position[movers[allowed]] = destination[allowed]
+
+        types = s.virus[symptomatic]
+        s.temperature[symptomatic] += FEVER[types]
+        s.water[symptomatic] -= DEHYDRATION[types]
+
+        sick = np.concatenate([asymptomatic, symptomatic])
+        incompatible = (s.temperature[sick] >= Person.MAX_TEMPERATURE_TO_SURVIVE) | \
+                       (s.water[sick] / s.weight[sick] <= Person.LOWEST_WATER_PCT_TO_SURVIVE)
+        threatening = (s.temperature[symptomatic] >= Person.LIFE_THREATENING_TEMPERATURE) | \
+                      (s.water[symptomatic] / s.weight[symptomatic] <= Person.LIFE_THREATENING_WATER_PCT)
+        alive = ~incompatible[len(asymptomatic):]
+        s.candidate[symptomatic[threatening & alive & (s.hospital[symptomatic] < 0)]] = True
+
+        dead = sick[incompatible]
+        s.state[dead] = DEAD
+        self.count(dead, C_DEAD)
+        self.release(dead)
+        self.hand_over()
+
+    def hand_over(self):
+        # Residents which left the tile, grouped by destination, into the own slice of the buffer
+        s, persons = self.shared, self.residents
+        where = tile_index(s.position[persons], self.canvas, self.tiles)
+        here = where == self.worker_id
+        self.staying = persons[here]
+        away, where = persons[~here], where[~here]
+        order = np.argsort(where, kind='stable')
+        s.handover[self.offset:self.offset + len(away)] = away[order]
+        s.handover_counts[self.worker_id] = np.bincount(where, minlength=len(s.handover_counts))
+
+    def arrivals(self):
+        s, parts = self.shared, [self.staying]
+        offsets, counts = s.resident_offsets, s.handover_counts
+        for source in range(len(counts)):
+            if source != self.worker_id and counts[source, self.worker_id]:
+                start = offsets[source] + counts[source, :self.worker_id].sum()
+                parts.append(np.array(s.handover[start:start + counts[source, self.worker_id]]))
+        return np.concatenate(parts)
+
+    def publish_infectors(self):
+        s = self.shared
+        min_j, max_j, min_i, max_i = self.tile
+        self.visitors = self.arrivals()
+
+        infectors = self.visitors[s.state[self.visitors] == ASYMPTOMATIC]
+        block = np.zeros((len(INFECTION_TYPES), max_j - min_j + 1, max_i - min_i + 1), dtype=np.int32)
+        np.add.at(block, (s.virus[infectors], s.position[infectors, 0] - min_j, s.position[infectors, 1] - min_i), 1)
+        grid_j, grid_i = self.grid[0], self.grid[2]
+        s.grid[:, min_j - grid_j:max_j - grid_j + 1, min_i - grid_i:max_i - grid_i + 1] = block
+
+    def interact(self):
+        s = self.shared
+        min_j, max_j, min_i, max_i = self.tile
+        grid_j, grid_i = self.grid[0], self.grid[2]
+        reach_j = max(abs(dj) for dj, di in self.stencil)
+        reach_i = max(abs(di) for dj, di in self.stencil)
+
+        # Own tile with the halo around it, cut by the grid borders
+        lo_j, lo_i = max(min_j - reach_j, grid_j), max(min_i - reach_i, grid_i)
+        hi_j, hi_i = min(max_j + reach_j, self.grid[1]), min(max_i + reach_i, self.grid[3])
+        block = s.grid[:, lo_j - grid_j:hi_j - grid_j + 1, lo_i - grid_i:hi_i - grid_i + 1]
+        block = neighbour_sum(np.array(block), self.stencil)
+
+        healthy = self.visitors[s.state[self.visitors] == HEALTHY]
+        exposure = block[:, s.position[healthy, 0] - lo_j, s.position[healthy, 1] - lo_i].T
+        exposure = np.where(s.antibodies[healthy], 0, exposure)
+        kind, strength, max_dist = self.policy()
+        types = choose_infection(self.rng, exposure, infection_probability(kind, strength))
+
+        infected, types = healthy[types >= 0], types[types >= 0]
+        s.state[infected] = ASYMPTOMATIC
+        s.virus[infected] = types
+        s.strength[infected] = self.rng.exponential(1.0 / RATE[types])
+        s.days_sick[infected] = 0
+
+    def night_actions(self):
+        s, persons = self.shared, self.residents
+        state = s.state[persons]
+        asymptomatic, symptomatic = persons[state == ASYMPTOMATIC], persons[state == SYMPTOMATIC]
+
+        at_home = persons[(state == HEALTHY) | (state == ASYMPTOMATIC)]
+        s.position[at_home] = s.home[at_home]
+
+        feel_bad = asymptomatic[s.days_sick[asymptomatic] == AsymptomaticSick.DAYS_SICK_TO_FEEL_BAD]
+        s.state[feel_bad] = SYMPTOMATIC
+        self.count(feel_bad, C_INFECTED)
+        s.days_sick[asymptomatic] += 1
+
+        s.strength[symptomatic] -= 3.0 / s.age[symptomatic]
+        recovered = symptomatic[s.strength[symptomatic] <= 0]
+        self.count(recovered, C_RECOVERED)
+        s.antibodies[recovered, s.virus[recovered]] = True
+        s.state[recovered] = HEALTHY
+        s.virus[recovered] = -1
+        self.release(recovered)
+
+
+def run_worker(names, layout, worker_id, tile, canvas, tiles, grid, community_position, seed, barrier):
+    shared = SharedArrays(layout, names)
+    try:
+        worker = TileWorker(shared, worker_id, tile, canvas, tiles, grid, community_position, seed)
+        while True:
+            barrier.wait()
+            worker.day_actions()
+            barrier.wait()
+            worker.publish_infectors()
+            barrier.wait()
+            worker.interact()
+            barrier.wait()
+            worker.night_actions()
+            barrier.wait()
+    except BrokenBarrierError:
+        pass
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        shared.close()
+
+
+class ShardedSimulation:
+    """
+        Runs the simulation on tiles[0] x tiles[1] worker processes.
+        infections are given as in lib.simulation.initialize.
+    """
+
+    def __init__(self, canvas, n_persons, n_hospitals, capacity=100, tiles=(2, 2), infections=(),
+                 community_position=(50, 50), seed=None):
+        self.canvas = canvas
+        self.n_persons = n_persons
+        self.tiles_shape = tiles
+        self.tiles = split_canvas(canvas, tiles)
+        self.community_position = community_position
+        self.grid = grid_bounds(canvas, community_position)
+        # The tile of the community position covers it also when it is outside the canvas
+        owner = int(tile_index(np.array([community_position]), canvas, tiles)[0])
+        min_j, max_j, min_i, max_i = self.tiles[owner]
+        self.tiles[owner] = (min(min_j, community_position[0]), max(max_j, community_position[0]),
+                             min(min_i, community_position[1]), max(max_i, community_position[1]))
+
+        # None draws fresh entropy like lib.batch
+        self.seed = seed
+        self.seeds = np.random.SeedSequence(seed).spawn(len(self.tiles) + 1)
+        self.rng = np.random.default_rng(self.seeds[-1])
+
+        self.layout = shared_layout(n_persons, len(self.tiles), self.grid)
+        self.shared = SharedArrays(self.layout)
+        self.populate(infections)
+
+        self.capacity = np.full(n_hospitals, capacity)
+        self.expensive = self.rng.random(n_hospitals) <= 0.3
+        self.patients = np.zeros(0, dtype=np.int64)
+        self.policy = Policy(0.0)
+        self.set_policy(self.policy)
+        self.observer = Observer([])
+
+        self.barrier = None
+        self.workers = []
+
+    def populate(self, infections):
+        # See lib.batch.BatchContext
+        s, rng = self.shared, self.rng
+        min_j, max_j, min_i, max_i = self.canvas
+        n = self.n_persons
+        s.community[:] = np.arange(n) >= int(n * 0.75)
+        s.home[:] = rng.integers([min_j, min_i], [max_j, max_i], size=(n, 2), endpoint=True)
+        s.position[:] = s.home
+        home_tile = tile_index(s.home, self.canvas, self.tiles_shape)
+        s.residents[:] = np.argsort(home_tile, kind='stable')
+        s.resident_offsets[1:] = np.cumsum(np.bincount(home_tile, minlength=len(self.tiles)))
+        s.age[:] = rng.integers(1, 90, size=n, endpoint=True)
+        s.weight[:] = rng.integers(30, 120, size=n, endpoint=True)
+        s.temperature[:] = NORMAL_TEMPERATURE
+        s.water[:] = 0.6 * s.weight
+        s.state[:] = HEALTHY
+        s.virus[:] = -1
+        s.hospital[:] = -1
+
+        for infection_type, fraction in infections:
+            infected = np.flatnonzero((rng.random(n) < fraction) & (s.state == HEALTHY))
+            code = INFECTION_TYPES.index(infection_type)
+            s.state[infected] = ASYMPTOMATIC
+            s.virus[infected] = code
+            s.strength[infected] = rng.exponential(1.0 / RATE[code], size=len(infected))
+
+    def start(self):
+        ctx = multiprocessing.get_context()
+        self.barrier = ctx.Barrier(len(self.tiles) + 1)
+        for worker_id, tile in enumerate(self.tiles):
+            process = ctx.Process(target=run_worker, daemon=True,
+                                  args=(self.shared.names, self.layout, worker_id, tile, self.canvas,
+                                        self.tiles_shape, self.grid, self.community_position,
+                                        self.seeds[worker_id], self.barrier))
+            process.start()
+            self.workers.append(process)
+
+    def close(self):
+        if self.workers:
+            # Workers leave on the broken barrier wherever they are
+            self.barrier.abort()
+            for process in self.workers:
+                process.join()
+            self.workers = []
+        self.shared.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def set_policy(self, policy):
+        control = self.shared.control
+        control[CONTROL_KIND], control[CONTROL_STRENGTH], control[CONTROL_MAX_DIST] = encode_policy(policy)
+        self.policy = policy
+
+    def make_policy(self):
+        observer = self.observer
+        if len(observer.infected_hist) == 0:
+            return
+
+        decision = decide_policy(self.policy,
+                                 sum(observer.infected_hist[-1].values()),
+                                 sum(observer.recovered_hist[-1].values()),
+                                 sum(observer.dead_hist[-1].values()),
+                                 self.n_persons)
+        if decision != self.policy:
+            observer.notify_policy(decision)
+            self.set_policy(decision)
+
+    def treat_patients(self):
+        # See lib.batch.BatchContext.treat_patients
+        s, patients = self.shared, self.patients
+        dose1, dose2 = self.rng.random(len(patients)), self.rng.random(len(patients))
+        expensive = self.expensive[s.hospital[patients]]
+        types = s.virus[patients]
+        fever = TREATS_FEVER[types]
+
+        temperature = s.temperature[patients]
+        temperature = np.where(fever & expensive, NORMAL_TEMPERATURE, temperature)
+        temperature = np.where(fever & ~expensive,
+                               np.maximum(NORMAL_TEMPERATURE, temperature - dose1 * ASPIRIN_EFFICIENCY), temperature)
+        s.temperature[patients] = temperature
+        s.water[patients] = np.where(~fever & ~expensive,
+                                     np.minimum(s.water[patients] + dose1 * GLUCOSE_EFFICIENCY, 0.6 * s.weight[patients]),
+                                     s.water[patients])
+        s.strength[patients] -= np.where(expensive, dose2 * ANTIVIRUS_EFFICIENCY[types], 0.0)
+
+    def hospitalize(self):
+        s = self.shared
+        candidates = np.flatnonzero(s.candidate)
+        s.candidate[candidates] = False
+
+        # Workers release dead patients during the day actions
+        self.patients = self.patients[s.hospital[self.patients] >= 0]
+        occupancy = np.bincount(s.hospital[self.patients], minlength=len(self.capacity))
+        free = np.cumsum(self.capacity - occupancy)
+        hospital = (np.arange(len(candidates))[:, None] >= free).sum(axis=1)
+        admitted = hospital < len(self.capacity)
+        s.hospital[candidates[admitted]] = hospital[admitted]
+        self.patients = np.concatenate([self.patients, candidates[admitted]])
+        self.observer.hositalized += int(admitted.sum())
+
+    def reduce_counters(self):
+        counters = self.shared.counters.sum(axis=0)
+        self.shared.counters.fill(0)
+        observer = self.observer
+        for k, infection_type in enumerate(INFECTION_TYPES):
+            if counters[C_INFECTED, k]:
+                observer.infected[infection_type] += int(counters[C_INFECTED, k])
+            if counters[C_RECOVERED, k]:
+                observer.recovered[infection_type] += int(counters[C_RECOVERED, k])
+                observer.ab[infection_type] += int(counters[C_RECOVERED, k])
+            if counters[C_DEAD, k]:
+                observer.dead[infection_type] += int(counters[C_DEAD, k])
+        observer.hositalized -= int(counters[C_HOSP_OUT, 0])
+
+    def simulate_day(self):
+        if not self.workers:
+            raise RuntimeError('ShardedSimulation is not started')
+
+        self.make_policy()
+        self.treat_patients()
+
+        barrier = self.barrier
+        barrier.wait()  # day actions
+        barrier.wait()  # hand over and publish infectors
+        self.hospitalize()
+        barrier.wait()  # contacts with halo exchange
+        barrier.wait()  # night actions
+        barrier.wait()
+
+        self.patients = self.patients[self.shared.hospital[self.patients] >= 0]
+        self.reduce_counters()
+        self.observer.notify_day_end()
+
+    def export_df(self):
+        return self.observer.export_df()
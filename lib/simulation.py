@@ -1,32 +1,108 @@
 import random
+from time import perf_counter
 
 from lib.drugs import ExpensiveDrugRepository, CheapDrugRepository
 from lib.person import DefaultPersonFactory, CommunityPersonFactory
-from lib.health import Hospital
+from lib.health import Hospital, DepartmentOfHealth, GlobalContext
+from lib.observer import Observer
+from lib.logger import Logger
+from lib.deseases import get_infectable
+from lib.basic_person import Person, AsymptomaticSick, SymptomaticSick, Dead
+from lib.contacts import interact_indexed
 
 
 def simulate_day(context):
     persons, health_dept, hospitals = context.persons, context.health_dept, context.health_dept.hospitals
+    timings = context.phase_timings
+    start = perf_counter()
 
     health_dept.make_policy()
+    policy_end = perf_counter()
 
     for hospital in hospitals:
         hospital.treat_patients()
+    treatment_end = perf_counter()
 
     for person in persons:
         person.day_actions()
+    day_end = perf_counter()
 
-    for person in persons:
-        for other in persons:
-            if person is not other and person.is_close_to(other):
-                person.interact(other)
+    interact(persons)
+    interaction_end = perf_counter()
 
     for person in persons:
         person.night_actions()
+    night_end = perf_counter()
+
+    # Seconds spent in every phase of the latest day
+    timings['policy'] = policy_end - start
+    timings['treatment'] = treatment_end - policy_end
+    timings['day'] = day_end - treatment_end
+    timings['interaction'] = interaction_end - day_end
+    timings['night'] = night_end - interaction_end
 
     context.observer.notify_day_end()
 
 
+def is_epidemic_extinct(context):
+    for hospital in context.health_dept.hospitals:
+        if hospital.patients:
+            return False
+
+    for person in context.persons:
+        if isinstance(person.state, (AsymptomaticSick, SymptomaticSick)):
+            return False
+    return True
+
+
+def deaths_exceed(fraction):
+    """Stop condition: more than the given fraction of the population is dead."""
+    def condition(context):
+        n_dead = sum(1 for person in context.persons if isinstance(person.state, Dead))
+        return n_dead > fraction * len(context.persons)
+    return condition
+
+
+def fast_forward(context, n_days):
+    # Without sick persons only the movement changes, which affects no statistics.
+    # Policy decisions still see the last simulated day, so they are kept.
+    for day in range(n_days):
+        context.health_dept.make_policy()
+        context.observer.notify_day_end()
+
+
+def run_simulation(context, n_days, stop_conditions=(), extinction=True, progress=iter):
+    """
+        Simulates up to n_days and returns the number of days actually simulated.
+        The run stops as soon as any of stop_conditions(context) is true.
+        Once the epidemic is extinct the rest of n_days is filled by fast_forward,
+        so the Observer still has n_days rows. progress wraps the days, e.g. tqdm.tqdm.
+    """
+    for day in progress(range(n_days)):
+        if extinction and is_epidemic_extinct(context):
+            fast_forward(context, n_days - day)
+            return day
+
+        if any(condition(context) for condition in stop_conditions):
+            return day
+
+        simulate_day(context)
+
+    return n_days
+
+
+def interact(persons):
+    interact_indexed(persons, GlobalContext().canvas)
+
+
+def interact_all_pairs(persons):
+    # Reference implementation of interact
+    for person in persons:
+        for other in persons:
+            if person is not other and person.is_close_to(other):
+                person.interact(other)
+
+
 def create_hospitals(n_hospitals, capacity=100):
     hospitals = [
         Hospital(capacity=capacity,
@@ -55,3 +131,42 @@ def create_persons(min_j, max_j, min_i, max_i, n_persons):
         persons.append(community_factory.get_person())
 
     return persons
+
+
+def initialize(min_j, max_j, min_i, max_i, n_persons, n_hospitals, capacity=100, infections=(), provenance=None,
+               landscape=None, batched_events=True, retention=None):
+    """
+        Builds a fresh simulation context. Any previously created context is dropped.
+        infections is a sequence of (InfectableType, fraction of population) applied in order.
+        provenance is an optional lib.provenance.ProvenanceLog, attached before the initial infections.
+        landscape is an optional lib.landscape.Landscape, persons then live and go by its raster and venues.
+        Its canvas must be the one given by min_j, max_j, min_i, max_i.
+        batched_events=False restores the per-event Observer callbacks (and their log lines).
+        retention is an optional lib.observer.Retention bounding the memory of the Observer history.
+    """
+    if landscape is not None and tuple(landscape.canvas) != (min_j, max_j, min_i, max_i):
+        raise ValueError('landscape canvas {} differs from the canvas {}'.format(
+            tuple(landscape.canvas), (min_j, max_j, min_i, max_i)))
+
+    GlobalContext.reset()
+    DepartmentOfHealth.reset()
+    Person.reset_ids()
+    Logger(print_info=False)
+
+    if landscape is not None:
+        persons = landscape.create_persons(n_persons)
+    else:
+        persons = create_persons(min_j, max_j, min_i, max_i, n_persons)
+    hospitals = create_hospitals(n_hospitals, capacity=capacity)
+
+    health_dept = DepartmentOfHealth(hospitals)
+    observer = Observer(persons + [health_dept], retention, batched=batched_events)
+    observer.provenance = provenance
+    context = GlobalContext((min_j, max_j, min_i, max_i), persons, health_dept, observer)
+
+    for infection_type, fraction in infections:
+        for person in persons:
+            if random.random() < fraction:
+                person.state.get_infected(get_infectable(infection_type))
+
+    return context
@@ -0,0 +1,161 @@
+"""
+    Rare-event estimates by fixed-effort multilevel splitting.
+
+    The probability that the running maximum of a score (hospital occupancy, deaths, days at full
+    capacity, ...) reaches a target within n_days is the product of conditional probabilities of
+    reaching each level from the previous one. Every stage runs the same number of trajectories,
+    started from deep copies of the states which hit the previous level, spread evenly over them,
+    each clone with a fresh seed. The product estimator is unbiased; error bars come from
+    independent repetitions.
+
+    Checkpoints keep n_per_level contexts alive, so memory grows with n_per_level * population.
+    Runs with lib.random_streams installed are not supported, the clones reseed the global random.
+"""
+import copy
+import random
+
+import numpy as np
+
+from lib.basic_person import Dead
+from lib.estimation import mean_interval
+from lib.health import GlobalContext, DepartmentOfHealth
+from lib.simulation import simulate_day, is_epidemic_extinct
+
+
+def occupancy(context):
+    return sum(len(hospital.patients) for hospital in context.health_dept.hospitals)
+
+
+def deaths(context):
+    return sum(1 for person in context.persons if isinstance(person.state, Dead))
+
+
+def days_at_capacity(context):
+    # Days which ended with all hospital beds taken
+    capacity = sum(hospital.capacity for hospital in context.health_dept.hospitals)
+    occupied, days = 0, 0
+    for hospitalized in context.observer.hospitalized_hist:
+        occupied += hospitalized
+        days += occupied >= capacity
+    return days
+
+
+class Trajectory:
+    def __init__(self, context, day, best):
+        self.context = context
+        self.day = day
+        # Running maximum of the score
+        self.best = best
+
+
+def reseed(context, seed):
+    random.seed(seed)
+    schedule = getattr(context, 'schedule', None)
+    if schedule is not None:
+        schedule.generator = np.random.default_rng(seed)
+
+
+def restore(context):
+    GlobalContext.set(context)
+    DepartmentOfHealth.set(context.health_dept)
+
+
+class SplittingResult:
+    def __init__(self, probability, stages, days_simulated):
+        self.probability = probability
+        # Conditional probability of every level
+        self.stages = stages
+        self.days_simulated = days_simulated
+
+    def __repr__(self):
+        return 'SplittingResult(p={:.3g}, stages={}, days={})'.format(
+            self.probability, ['{:.3f}'.format(p) for p in self.stages], self.days_simulated)
+
+
+class SplittingEstimate:
+    def __init__(self, results, level=0.95):
+        self.results = results
+        self.probability, self.half_width = mean_interval([r.probability for r in results], level)
+        self.days_simulated = sum(r.days_simulated for r in results)
+
+    def __repr__(self):
+        return 'SplittingEstimate(p={:.3g} +- {:.2g}, repetitions={}, days={})'.format(
+            self.probability, self.half_width, len(self.results), self.days_simulated)
+
+
+class SplittingRunner:
+    """
+        initialize_context builds a fresh context (see lib.simulation.initialize), score maps a
+        context to a number, levels are increasing thresholds of the score, the last one is the
+        event of interest. With stop_when_extinct, trajectories stop once the epidemic is over,
+        which is exact for scores that do not change afterwards (all the scores above).
+    """
+
+    def __init__(self, initialize_context, score, levels, n_days, n_per_level=100, stop_when_extinct=True, seed=None):
+        self.initialize_context = initialize_context
+        self.score = score
+        self.levels = list(levels)
+        self.n_days = n_days
+        self.n_per_level = n_per_level
+        self.stop_when_extinct = stop_when_extinct
+        self.rng = random.Random(seed)
+        self.days_simulated = 0
+
+    def advance(self, trajectory, level):
+        """Simulates until the score reaches the level or the run ends, True when the level is reached."""
+        context = trajectory.context
+        # Trajectories of a stage share the singletons used inside simulate_day
+        restore(context)
+        while trajectory.best < level and trajectory.day < self.n_days:
+            if self.stop_when_extinct and is_epidemic_extinct(context):
+                break
+            simulate_day(context)
+            trajectory.day += 1
+            trajectory.best = max(trajectory.best, self.score(context))
+            self.days_simulated += 1
+        return trajectory.best >= level
+
+    def start(self):
+        reseed(None, self.rng.getrandbits(64))
+        context = self.initialize_context()
+        return Trajectory(context, 0, self.score(context))
+
+    def clone(self, trajectory):
+        context = copy.deepcopy(trajectory.context)
+        restore(context)
+        reseed(context, self.rng.getrandbits(64))
+        return Trajectory(context, trajectory.day, trajectory.best)
+
+    def estimate(self):
+        """One splitting run, SplittingResult with the product estimate."""
+        self.days_simulated = 0
+        stages, hits = [], None
+        for level in self.levels:
+            if hits is None:
+                trajectories = [self.start() for _ in range(self.n_per_level)]
+            else:
+                # Even allocation over the states which reached the previous level
+                order = list(range(len(hits)))
+                self.rng.shuffle(order)
+                trajectories = [self.clone(hits[order[k % len(hits)]]) for k in range(self.n_per_level)]
+
+            hits = [trajectory for trajectory in trajectories if self.advance(trajectory, level)]
+            stages.append(len(hits) / self.n_per_level)
+            if not hits:
+                break
+
+        probability = float(np.prod(stages)) if len(stages) == len(self.levels) else 0.0
+        return SplittingResult(probability, stages, self.days_simulated)
+
+    def run(self, repetitions=10, level=0.95):
+        """Independent splitting runs, the estimate with its confidence interval."""
+        return SplittingEstimate([self.estimate() for _ in range(repetitions)], level)
+
+
+def monte_carlo(initialize_context, score, threshold, n_days, n_runs, stop_when_extinct=True, seed=None, level=0.95):
+    """Plain Monte Carlo estimate of the same probability: (probability, half width, days simulated)."""
+    runner = SplittingRunner(initialize_context, score, [threshold], n_days, n_per_level=1,
+                             stop_when_extinct=stop_when_extinct, seed=seed)
+    hits = [runner.advance(runner.start(), threshold) for _ in range(n_runs)]
+    probability, half_width = mean_interval([float(hit) for hit in hits], level)
+    return probability, half_width, runner.days_simulated
@@ -0,0 +1,178 @@
+"""
+    Live telemetry of a running simulation over HTTP and WebSocket.
+
+    TelemetryPublisher is subscribed to the Observer and, once per day end, replaces a single-slot
+    snapshot (one reference assignment, atomic under the GIL). TelemetryServer runs an asyncio loop
+    in a daemon thread and only reads that slot, so the simulation never waits for viewers.
+
+        GET /            latest snapshot as JSON
+        GET /ws          WebSocket, a text frame with the snapshot after every simulated day
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class TelemetryPublisher:
+    def __init__(self, context):
+        self.context = context
+        self.totals = {}
+        self.snapshot = None
+
+    def on_day_end(self, observer):
+        daily = {}
+        for metric in ['infected', 'recovered', 'ab', 'dead']:
+            day = {infection_type.name: value for infection_type, value in getattr(observer, metric + '_hist')[-1].items()}
+            totals = self.totals.setdefault(metric, {})
+            for name, value in day.items():
+                totals[name] = totals.get(name, 0) + value
+            daily[metric] = day
+
+        hospitals = self.context.health_dept.hospitals
+        # A new dict every day, viewers may keep reading the previous one
+        self.snapshot = {
+            'day': observer.day,
+            'time': time.time(),
+            'policy': str(self.context.policy),
+            'daily': daily,
+            'totals': {metric: dict(values) for metric, values in self.totals.items()},
+            'hospitals': [{'patients': len(hospital.patients), 'capacity': hospital.capacity}
+                          for hospital in hospitals],
+            'phase_timings': dict(self.context.phase_timings),
+        }
+
+
+class TelemetryServer:
+    """
+        Serves TelemetryPublisher snapshots on localhost, port 0 picks a free port.
+        Viewers are polled for new snapshots every `interval` seconds.
+    """
+
+    def __init__(self, publisher, host='127.0.0.1', port=0, interval=0.1):
+        self.publisher = publisher
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(self.host, self.port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self.thread.start()
+        self.started.wait()
+        return self
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+            self.loop.run_until_complete(asyncio.sleep(0))
+            self.loop.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+            lines = request.decode('latin-1').split('\r\n')
+            path = lines[0].split(' ')[1] if len(lines[0].split(' ')) > 1 else '/'
+            headers = {}
+            for line in lines[1:]:
+                if ':' in line:
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+
+            if path == '/ws' and headers.get('upgrade', '').lower() == 'websocket':
+                if headers.get('sec-websocket-key'):
+                    await self._websocket(reader, writer, headers['sec-websocket-key'])
+                else:
+                    self._respond(writer, '400 Bad Request', b'null')
+            elif path in ('/', '/snapshot'):
+                self._respond(writer, '200 OK', json.dumps(self.publisher.snapshot).encode())
+            else:
+                self._respond(writer, '404 Not Found', b'null')
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _respond(writer, status, body):
+        writer.write('HTTP/1.1 {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n'
+                     'Connection: close\r\n\r\n'.format(status, len(body)).encode() + body)
+
+    async def _websocket(self, reader, writer, key):
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest())
+        writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        await writer.drain()
+
+        closed = asyncio.ensure_future(self._read_until_close(reader))
+        sent = None
+        while not closed.done():
+            snapshot = self.publisher.snapshot
+            if snapshot is not None and snapshot is not sent:
+                writer.write(websocket_frame(json.dumps(snapshot).encode()))
+                await writer.drain()
+                sent = snapshot
+            await asyncio.wait([closed], timeout=self.interval)
+        writer.write(websocket_frame(b'', opcode=0x8))
+
+    @staticmethod
+    async def _read_until_close(reader):
+        # Client frames are ignored, the connection ends with a close frame or EOF
+        try:
+            while True:
+                header = await reader.readexactly(2)
+                length = header[1] & 0x7F
+                if length == 126:
+                    length = struct.unpack('!H', await reader.readexactly(2))[0]
+                elif length == 127:
+                    length = struct.unpack('!Q', await reader.readexactly(8))[0]
+                await reader.readexactly(length + (4 if header[1] & 0x80 else 0))
+                if header[0] & 0x0F == 0x8:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+
+
+def websocket_frame(payload, opcode=0x1):
+    # Server frames are never masked
+    if len(payload) < 126:
+        header = struct.pack('!BB', 0x80 | opcode, len(payload))
+    elif len(payload) < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, len(payload))
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, len(payload))
+    return header + payload
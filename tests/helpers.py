@@ -0,0 +1,16 @@
+import random
+
+from lib.simulation import initialize, simulate_day
+
+
+def new_context(seed=None, canvas=(0, 40, 0, 40), n_persons=200, n_hospitals=1, capacity=10, **kwargs):
+	"""Seeds random (unless seed is None) and initializes a small object-engine population."""
+	if seed is not None:
+		random.seed(seed)
+	return initialize(*canvas, n_persons, n_hospitals, capacity=capacity, **kwargs)
+
+
+def run_days(context, n_days):
+	for _ in range(n_days):
+		simulate_day(context)
+	return context
@@ -0,0 +1,45 @@
+import unittest
+
+from lib.batch import create_batch, simulate_day, contact_stencil
+from lib.deseases import InfectableType
+
+
+class BatchTest(unittest.TestCase):
+	def test_stencil(self):
+		self.assertEqual(sorted(contact_stencil((0, 100, 0, 100))), [(-1, 0), (0, -1), (0, 0), (0, 1), (1, 0)])
+
+	def test_replicas(self):
+		context = create_batch(0, 50, 0, 50, 200, 8, 2, capacity=10,
+							   infections=[(InfectableType.SARSCoV2, 0.1)], seed=1)
+		for day in range(30):
+			simulate_day(context)
+
+		self.assertEqual(len(context.observer.infected_hist), 30)
+		for replica in range(8):
+			df = context.observer.export_df(replica)
+			self.assertEqual(len(df), 30)
+			self.assertEqual(df['infected_all'].sum(), df['infected_SARSCoV2'].sum())
+			self.assertLessEqual(df['recovered_all'].sum() + df['dead_all'].sum(), df['infected_all'].sum())
+			self.assertGreaterEqual(df['hospitalized'].cumsum().min(), 0)
+			self.assertLessEqual(df['hospitalized'].cumsum().max(), 20)
+
+	def test_seeded(self):
+		infections = [(InfectableType.Cholera, 0.2)]
+		dfs = []
+		for i in range(2):
+			context = create_batch(0, 50, 0, 50, 100, 2, 1, infections=infections, seed=3)
+			for day in range(10):
+				simulate_day(context)
+			dfs.append(context.observer.export_df(1))
+		self.assertTrue(dfs[0].equals(dfs[1]))
+
+	def test_community_outside_canvas(self):
+		# The default community position (50, 50) lies outside smaller canvases
+		context = create_batch(0, 30, 0, 30, 100, 2, 1, infections=[(InfectableType.SeasonalFlu, 0.2)], seed=2)
+		for day in range(10):
+			simulate_day(context)
+		self.assertGreater(context.observer.export_df(0)['infected_all'].sum(), 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,54 @@
+import math
+import unittest
+
+from lib.comparison import PairedComparison, ComparisonResult, total_infected
+from lib.deseases import InfectableType
+from lib.estimation import t_quantile
+from lib.health import PPEPolicy
+from lib.simulation import initialize
+
+INFECTIONS = [(InfectableType.SeasonalFlu, 0.1)]
+
+
+def ppe(context):
+	context.policy = PPEPolicy(0.9)
+
+
+class PairedComparisonTest(unittest.TestCase):
+	def setUp(self):
+		self.comparison = PairedComparison(
+			lambda: initialize(0, 20, 0, 20, 60, 1, capacity=5, infections=INFECTIONS),
+			{'baseline': None, 'same': None, 'ppe': ppe}, metric=total_infected, n_days=30)
+
+	def test_identical_arms(self):
+		result = self.comparison.run(range(3))
+		self.assertEqual(result.differences('same', 'baseline'), [0, 0, 0])
+		summary = result.summary('ppe', 'baseline')
+		self.assertLessEqual(summary['low'], summary['difference'])
+		self.assertEqual(summary['replicas'], 3)
+
+	def test_common_random_numbers(self):
+		# The arms draw differently from the first contact on, the streams keep the agents aligned
+		comparison = PairedComparison(
+			lambda: initialize(0, 20, 0, 20, 60, 1, capacity=5, infections=INFECTIONS),
+			{'baseline': None, 'ppe': lambda context: setattr(context, 'policy', PPEPolicy(0.3))},
+			metric=total_infected, n_days=30)
+		common = comparison.run(range(8)).summary('ppe', 'baseline')
+		independent = comparison.run(range(8), common_random_numbers=False).summary('ppe', 'baseline')
+		self.assertLess(common['paired_variance'], independent['paired_variance'])
+
+	def test_single_replica(self):
+		summary = ComparisonResult({'baseline': [4.0], 'ppe': [1.0]}).summary('ppe', 'baseline')
+		self.assertEqual(summary['difference'], -3.0)
+		self.assertEqual((summary['low'], summary['high']), (-math.inf, math.inf))
+		self.assertEqual((summary['unpaired_low'], summary['unpaired_high']), (-math.inf, math.inf))
+		self.assertTrue(math.isnan(summary['variance_reduction']))
+
+	def test_t_quantile(self):
+		self.assertAlmostEqual(t_quantile(0.975, 1), 12.706, places=3)
+		self.assertAlmostEqual(t_quantile(0.975, 2), 4.303, places=3)
+		self.assertAlmostEqual(t_quantile(0.975, 10), 2.228, places=3)
+
+
+if __name__ == '__main__':
+	unittest.main()
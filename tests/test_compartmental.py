@@ -0,0 +1,71 @@
+import random
+import unittest
+
+import numpy as np
+
+from lib.compartmental import calibrate, CompartmentalModel, initialize_hybrid
+from lib.deseases import InfectableType
+from lib.rolling import PolicyRuleEngine
+from lib.simulation import initialize, simulate_day
+
+INFECTIONS = [(InfectableType.SARSCoV2, 0.1), (InfectableType.SeasonalFlu, 0.1)]
+
+
+class CompartmentalTest(unittest.TestCase):
+	def setUp(self):
+		random.seed(7)
+		self.rates = calibrate(lambda: initialize(0, 30, 0, 30, 150, 1, capacity=10, infections=INFECTIONS), n_days=15)
+
+	def test_rates(self):
+		for rates in self.rates.values():
+			self.assertGreaterEqual(rates.beta, 0)
+			self.assertLessEqual(rates.eta + rates.gamma + rates.mu, 1.0)
+			self.assertLessEqual(rates.gamma_h + rates.mu_h, 1.0)
+
+	def test_schema(self):
+		context = initialize(0, 30, 0, 30, 150, 1, capacity=10, infections=INFECTIONS)
+		for day in range(15):
+			simulate_day(context)
+		agents = context.observer.export_df()
+
+		model = CompartmentalModel(10 ** 6, self.rates, capacity=1000, infections=INFECTIONS)
+		for day in range(15):
+			model.simulate_day()
+		mean_field = model.export_df()
+		self.assertEqual(len(mean_field), 15)
+		self.assertTrue(set(agents.columns) <= set(mean_field.columns))
+
+	def test_reproduces_calibration_runs(self):
+		random.seed(3)
+		contexts = []
+
+		def initialize_context():
+			# Without policies, so that both engines run the same transmission throughout
+			contexts.append(initialize(0, 40, 0, 40, 600, 1, capacity=20, infections=INFECTIONS))
+			contexts[-1].health_dept.rules = PolicyRuleEngine(None, [])
+			return contexts[-1]
+		rates = calibrate(initialize_context, n_days=40, n_runs=4)
+
+		model = CompartmentalModel(600, rates, capacity=20, infections=INFECTIONS)
+		for day in range(40):
+			model.advance()
+		mean_field = model.export_df()
+		for column in ['infected_all', 'dead_all', 'recovered_all']:
+			agents = np.mean([context.observer.export_df()[column].sum() for context in contexts])
+			self.assertAlmostEqual(mean_field[column].sum() / agents, 1.0, delta=0.25, msg=column)
+
+	def test_hybrid(self):
+		hybrid = initialize_hybrid((0, 40, 0, 40), (0, 19, 0, 19), 600, 1, self.rates, capacity=20, infections=INFECTIONS)
+		for day in range(10):
+			hybrid.simulate_day()
+		df = hybrid.export_df()
+		self.assertEqual(list(df['day']), list(range(10)))
+		self.assertGreater(df['infected_all'].sum(), 0)
+
+	def test_empty_focus(self):
+		with self.assertRaises(ValueError):
+			initialize_hybrid((0, 400, 0, 400), (0, 0, 0, 0), 600, 1, self.rates, infections=INFECTIONS)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from lib.deseases import InfectableType
+from lib.equivalence import Scenario, compare, identical, object_runner, batch_runner, sharded_runner
+from lib.health import PPEPolicy
+from lib.schedule import Schedule
+
+
+class EquivalenceTest(unittest.TestCase):
+	def setUp(self):
+		self.scenario = Scenario((0, 40, 0, 40), 200, 1, capacity=10, n_days=40,
+								 infections=[(InfectableType.SARSCoV2, 0.05), (InfectableType.Cholera, 0.05)])
+
+	def test_batch_engine(self):
+		report = compare(object_runner(self.scenario), batch_runner(self.scenario), self.scenario, range(20),
+						 candidate_seeds=range(100, 140))
+		self.assertTrue(report.passed, report)
+
+	def test_sharded_engine(self):
+		report = compare(object_runner(self.scenario), sharded_runner(self.scenario), self.scenario, range(20),
+						 candidate_seeds=range(100, 140))
+		self.assertTrue(report.passed, report)
+
+	def test_schedule(self):
+		def schedule(context):
+			context.schedule = Schedule(context)
+		report = compare(object_runner(self.scenario), object_runner(self.scenario, setup=schedule), self.scenario,
+						 range(20), candidate_seeds=range(100, 120))
+		self.assertTrue(report.passed, report)
+
+	def test_detects_difference(self):
+		def masks(context):
+			context.health_dept.make_policy = lambda: None
+			context.policy = PPEPolicy(0.9)
+		scenario = Scenario((0, 20, 0, 20), 150, 1, capacity=10, n_days=30,
+							infections=[(InfectableType.SeasonalFlu, 0.05)])
+		report = compare(object_runner(scenario), object_runner(scenario, setup=masks), scenario,
+						 range(20), candidate_seeds=range(100, 120))
+		self.assertFalse(report.passed)
+		self.assertIn('infected_SeasonalFlu', set(report.failures()['column']))
+
+	def test_fast_forward_identical(self):
+		self.assertEqual(identical(object_runner(self.scenario), object_runner(self.scenario, extinction=True),
+								   range(3)), [])
+
+
+if __name__ == '__main__':
+	unittest.main()
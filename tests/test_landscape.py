@@ -0,0 +1,65 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from lib.deseases import InfectableType
+from lib.landscape import AliasTable, Landscape, VENUE_DTYPE
+from lib.simulation import initialize, simulate_day, interact_all_pairs
+import lib.simulation as simulation
+
+
+class AliasTableTest(unittest.TestCase):
+	def test_frequencies(self):
+		weights = np.array([0.0, 1.0, 2.0, 7.0])
+		draws = AliasTable(weights).sample_many(np.random.default_rng(0), 100000)
+		frequencies = np.bincount(draws, minlength=4) / len(draws)
+		self.assertTrue(np.allclose(frequencies, weights / weights.sum(), atol=0.01))
+
+
+class LandscapeTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		density = np.zeros((10, 10))
+		density[2, 3], density[7, 7] = 5.0, 1.0
+		venues = np.array([(10, 10, 1.0), (80, 40, 3.0)], dtype=VENUE_DTYPE)
+		np.save(os.path.join(self.directory.name, 'density.npy'), density)
+		np.save(os.path.join(self.directory.name, 'venues.npy'), venues)
+		self.landscape = Landscape.load((0, 99, 0, 99), os.path.join(self.directory.name, 'density.npy'),
+										os.path.join(self.directory.name, 'venues.npy'))
+
+	def tearDown(self):
+		del self.landscape
+		self.directory.cleanup()
+
+	def test_homes_and_venues(self):
+		random.seed(0)
+		persons = self.landscape.create_persons(200)
+		for person in persons:
+			self.assertIn((person.home_position[0] // 10, person.home_position[1] // 10), [(2, 3), (7, 7)])
+			self.assertIn(person.venue_position, [(10, 10), (80, 40)])
+
+	def test_contact_index_matches_all_pairs(self):
+		def run(interact):
+			random.seed(1)
+			context = initialize(0, 99, 0, 99, 150, 1, capacity=5, infections=[(InfectableType.SeasonalFlu, 0.1)],
+								 landscape=self.landscape)
+			simulation.interact, default = interact, simulation.interact
+			try:
+				for _ in range(15):
+					simulate_day(context)
+			finally:
+				simulation.interact = default
+			return context.observer.export_df()
+
+		self.assertTrue(run(interact_all_pairs).equals(run(simulation.interact)))
+
+	def test_canvas_mismatch(self):
+		with self.assertRaises(ValueError):
+			initialize(0, 49, 0, 49, 10, 1, landscape=self.landscape)
+
+
+if __name__ == '__main__':
+	unittest.main()
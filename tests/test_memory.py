@@ -0,0 +1,38 @@
+import tracemalloc
+import unittest
+
+from lib.deseases import InfectableType
+from lib.memory import memory_report, MemoryMonitor, MemoryReport
+from tests.helpers import new_context, run_days
+
+INFECTIONS = [(InfectableType.Cholera, 0.2)]
+
+
+class MemoryReportTest(unittest.TestCase):
+	def test_report(self):
+		context = new_context(0, (0, 20, 0, 20), 50, 2, capacity=5, infections=INFECTIONS)
+		monitor = MemoryMonitor(context, every=2)
+		context.observer.subscribe(monitor)
+		run_days(context, 4)
+
+		report = memory_report(context)
+		self.assertEqual(list(report.subsystems), MemoryReport.SUBSYSTEMS)
+		self.assertGreater(report.subsystems['persons'], 0)
+		self.assertGreater(report.subsystems['states'], 0)
+		self.assertAlmostEqual(report.bytes_per_agent(), report.total / 50)
+		self.assertEqual(list(monitor.export_df()['day']), [2, 4])
+
+	def test_traced_subsystems(self):
+		tracemalloc.start()
+		try:
+			context = run_days(new_context(1, (0, 20, 0, 20), 50, capacity=5, infections=INFECTIONS), 1)
+			traced = memory_report(context).traced
+		finally:
+			tracemalloc.stop()
+		self.assertLessEqual(set(traced), set(MemoryReport.SUBSYSTEMS) | {'other'})
+		self.assertGreater(traced['persons'], 0)
+		self.assertGreater(traced['states'], 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
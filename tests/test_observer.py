@@ -0,0 +1,72 @@
+import unittest
+from collections import Counter
+
+from lib.deseases import InfectableType
+from lib.observer import Observer, Retention
+from tests.helpers import new_context, run_days
+
+INFECTIONS = [(InfectableType.SARSCoV2, 0.1), (InfectableType.Cholera, 0.05)]
+
+
+class RetentionTest(unittest.TestCase):
+	def run_context(self, retention):
+		return run_days(new_context(5, infections=INFECTIONS, retention=retention), 60).observer
+
+	def test_retention(self):
+		full = self.run_context(None)
+		bounded = self.run_context(Retention(window=10, bucket=4, max_buckets=5))
+
+		self.assertEqual(len(bounded.dead_hist), 10)
+		self.assertLessEqual(len(bounded.buckets), 5)
+
+		daily = bounded.export_df()
+		self.assertEqual(list(daily['day']), list(range(50, 60)))
+		expected = full.export_df().iloc[50:].reset_index(drop=True)
+		self.assertTrue((daily['infected_all'].values == expected['infected_all'].values).all())
+
+		aggregated = bounded.export_df(resolution='aggregated')
+		self.assertEqual(aggregated['days'].sum(), 60)
+		reference = full.export_df()
+		for column in ['hospitalized', 'infected_all', 'recovered_all', 'dead_all']:
+			self.assertEqual(aggregated[column].sum(), reference[column].sum())
+		self.assertEqual(aggregated['hospitalized_max'].max(), reference['hospitalized'].cumsum().max())
+
+	def test_policy_spans(self):
+		full = self.run_context(None)
+		bounded = self.run_context(Retention(window=10, bucket=4, max_buckets=5))
+		# All transitions happen before the daily window of the last 10 days
+		self.assertLess(full.policies[-1][0], 50)
+		self.assertEqual(bounded.policies, [])
+
+		days = Counter()
+		for policies in bounded.export_df(resolution='aggregated')['policies']:
+			days.update(policies)
+		self.assertEqual(days, Counter(full.policy_hist))
+		self.assertGreater(len(days), 1)
+
+	def test_unbounded(self):
+		observer = self.run_context(None)
+		aggregated = observer.export_df(resolution='aggregated')
+		self.assertEqual(list(aggregated['days']), [7] * 8 + [4])
+
+	def test_initial_policy(self):
+		observer = Observer([], Retention(window=3, bucket=2, max_buckets=5))
+		for day in range(5):
+			observer.day_finished()
+		aggregated = observer.export_df(resolution='aggregated')
+		self.assertEqual(list(aggregated['policy']), ['Policy(p=0.00)'] * 3)
+
+
+class BatchedEventsTest(unittest.TestCase):
+	def run_context(self, batched):
+		return run_days(new_context(6, infections=INFECTIONS, batched_events=batched), 40).observer
+
+	def test_same_counters(self):
+		callbacks, batched = self.run_context(False), self.run_context(True)
+		self.assertTrue(callbacks.export_df().equals(batched.export_df()))
+		self.assertEqual(callbacks.policies, batched.policies)
+		self.assertEqual(len(batched.buffer), 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
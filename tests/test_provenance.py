@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from lib.deseases import InfectableType
+from lib.provenance import ProvenanceLog
+from tests.helpers import new_context, run_days
+
+INFECTIONS = [(InfectableType.SARSCoV2, 0.05), (InfectableType.SeasonalFlu, 0.05)]
+
+
+class ProvenanceTest(unittest.TestCase):
+	def setUp(self):
+		self.log = ProvenanceLog()
+		self.context = run_days(new_context(2, (0, 20, 0, 20), 150, infections=INFECTIONS, provenance=self.log), 30)
+
+	def naive_parents(self):
+		latest, parents = {}, []
+		for row in range(len(self.log)):
+			key = (self.log.infector[row], self.log.virus[row])
+			parents.append(latest.get(key, -1) if self.log.infector[row] >= 0 else -1)
+			latest[(self.log.infectee[row], self.log.virus[row])] = row
+		return parents
+
+	def test_parents(self):
+		self.assertGreater(len(self.log), 0)
+		self.assertEqual(list(self.log.parents()), self.naive_parents())
+
+		generation = self.log.generations()
+		parents = self.log.parents()
+		linked = parents >= 0
+		self.assertTrue((generation[linked] == generation[parents[linked]] + 1).all())
+		self.assertTrue((generation[~linked] == 0).all())
+
+	def test_queries(self):
+		r = self.log.reproduction_numbers()
+		self.assertEqual(r['cases'].sum(), len(self.log))
+		self.assertEqual(r['secondary'].sum(), (self.log.parents() >= 0).sum())
+		distribution = self.log.secondary_distribution()
+		self.assertEqual(distribution.sum(), len(self.log))
+		cells = self.log.superspreading_cells(top=3)
+		self.assertLessEqual(len(cells), 3)
+		self.assertTrue((cells['infections'].diff().dropna() <= 0).all())
+
+	def test_npz(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, 'provenance.npz')
+			self.log.to_npz(path)
+			loaded = ProvenanceLog.from_npz(path)
+		for name, column in self.log.columns().items():
+			self.assertTrue(np.array_equal(column, loaded.columns()[name]))
+
+	def test_parquet(self):
+		import pytest
+		pytest.importorskip('pyarrow')
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, 'provenance.parquet')
+			self.log.to_parquet(path)
+			loaded = pd.read_parquet(path)
+		pd.testing.assert_frame_equal(loaded, self.log.to_df())
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,59 @@
+import random
+import unittest
+from types import SimpleNamespace
+
+from lib.deseases import InfectableType
+from lib.health import PPEPolicy
+from lib.rolling import RollingWindow, RollingStatistics, PolicyRuleEngine, PolicyRule, Threshold, default_rules
+from tests.helpers import new_context, run_days
+
+INFECTIONS = [(InfectableType.SARSCoV2, 0.05), (InfectableType.SeasonalFlu, 0.05)]
+
+
+class RollingTest(unittest.TestCase):
+	def test_window(self):
+		window = RollingWindow(3)
+		values = [random.randint(0, 10) for i in range(20)]
+		for n, value in enumerate(values, 1):
+			window.push(value)
+			self.assertEqual(window.sum(), sum(values[max(n - 3, 0):n]))
+			self.assertEqual(window.previous, sum(values[max(n - 6, 0):max(n - 3, 0)]))
+			self.assertEqual(window.last(), value)
+
+	def test_late_type_mean(self):
+		stats = RollingStatistics(window=7)
+		observer = SimpleNamespace(hospitalized_hist=[0])
+		for day in range(10):
+			infected = {InfectableType.Cholera: 7} if day == 8 else {}
+			for metric in RollingStatistics.METRICS:
+				setattr(observer, metric + '_hist', [infected if metric == 'infected' else {}])
+			stats.on_day_end(observer)
+		self.assertEqual(stats.get('infected', InfectableType.Cholera).mean(), 1.0)
+		self.assertEqual(stats.get('dead', InfectableType.Cholera).mean(), 0.0)
+
+	def run_context(self, rules=None):
+		context = new_context(11, infections=INFECTIONS)
+		stats = RollingStatistics(window=7)
+		context.observer.subscribe(stats)
+		if rules is not None:
+			context.health_dept.rules = PolicyRuleEngine(stats, rules)
+		return run_days(context, 40), stats
+
+	def test_default_rules(self):
+		reference, stats = self.run_context()
+		context, stats = self.run_context(default_rules())
+		self.assertTrue(reference.observer.export_df().equals(context.observer.export_df()))
+		self.assertEqual(reference.observer.policies, context.observer.policies)
+
+		df = context.observer.export_df()
+		self.assertEqual(stats.get('infected').sum(), df['infected_all'][-7:].sum())
+		self.assertEqual(stats.get('dead', InfectableType.SARSCoV2).sum(), df['dead_SARSCoV2'][-7:].sum())
+		self.assertEqual(stats.occupancy, df['hospitalized'].sum())
+
+	def test_custom_rule(self):
+		context, stats = self.run_context([PolicyRule(Threshold('infected', 'sum', 0, per_capita=False), PPEPolicy(0.5))])
+		self.assertIn('PPEPolicy(p=0.50)', [policy for day, policy in context.observer.policies])
+
+
+if __name__ == '__main__':
+	unittest.main()
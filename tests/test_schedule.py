@@ -0,0 +1,66 @@
+import random
+import unittest
+
+import numpy as np
+
+from lib.deseases import InfectableType
+from lib.health import DistrictLockdownPolicy, TotalLockdownPolicy, CombinedPolicy
+from lib.schedule import Schedule, movement_kernel
+from lib.simulation import initialize, simulate_day
+
+
+class ScheduleTest(unittest.TestCase):
+	def test_kernel(self):
+		kernel = movement_kernel(CombinedPolicy([DistrictLockdownPolicy(0.5, 0.3), TotalLockdownPolicy(0.2)]))
+		self.assertEqual((kernel.radius, kernel.inside, kernel.outside), (0.3, 0.8, 0.4))
+		self.assertIsNone(movement_kernel(CombinedPolicy([DistrictLockdownPolicy(0.5), DistrictLockdownPolicy(0.5)])))
+
+	def test_district_moves(self):
+		random.seed(0)
+		context = initialize(0, 50, 0, 50, 400, 1)
+		context.policy = DistrictLockdownPolicy(0.7, 0.2)
+		schedule = Schedule(context, seed=1)
+		context.schedule = schedule
+
+		stays = []
+		for day in range(50):
+			context.observer.day = day
+			for person in context.persons:
+				person._day_actions()
+			stays.append([person.position == person.home_position for person in context.persons])
+			for person in context.persons:
+				person.position = person.home_position
+
+		roaming = schedule.roaming
+		expected = np.mean(0.7 * (1 - schedule.n_inside[roaming] / 51 ** 2))
+		self.assertAlmostEqual(np.mean(np.array(stays)[:, roaming]), expected, delta=0.015)
+
+	def test_equal_policy_keeps_kernel(self):
+		random.seed(1)
+		context = initialize(0, 30, 0, 30, 50, 1)
+		context.policy = DistrictLockdownPolicy(0.5, 0.2)
+		schedule = Schedule(context, seed=1)
+		schedule.move(context.persons[0])
+		kernel = schedule.kernel
+
+		context.observer.day += 1
+		context.policy = DistrictLockdownPolicy(0.5, 0.2)
+		schedule.move(context.persons[0])
+		self.assertIs(schedule.kernel, kernel)
+
+		context.observer.day += 1
+		context.policy = DistrictLockdownPolicy(0.6, 0.2)
+		schedule.move(context.persons[0])
+		self.assertIsNot(schedule.kernel, kernel)
+
+	def test_simulation(self):
+		random.seed(2)
+		context = initialize(0, 30, 0, 30, 80, 1, capacity=5, infections=[(InfectableType.SeasonalFlu, 0.1)])
+		context.schedule = Schedule(context, seed=2)
+		for _ in range(20):
+			simulate_day(context)
+		self.assertEqual(len(context.observer.export_df()), 20)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from lib.deseases import InfectableType
+from lib.sharded import ShardedSimulation, TileWorker, split_canvas, tile_index
+
+
+class ShardedTest(unittest.TestCase):
+	def test_split_canvas(self):
+		tiles = split_canvas((0, 100, 0, 50), (3, 2))
+		self.assertEqual(len(tiles), 6)
+		self.assertEqual(sum((t[1] - t[0] + 1) * (t[3] - t[2] + 1) for t in tiles), 101 * 51)
+
+	def test_tile_index(self):
+		canvas, shape = (0, 100, 0, 50), (3, 2)
+		tiles = split_canvas(canvas, shape)
+		positions = np.array([[0, 0], [100, 50], [50, 10], [150, 70], [-5, 20]])
+		for position, index in zip(positions, tile_index(positions, canvas, shape)):
+			min_j, max_j, min_i, max_i = tiles[index]
+			j, i = np.clip(position, [0, 0], [100, 50])
+			self.assertTrue(min_j <= j <= max_j and min_i <= i <= max_i)
+
+	def test_community_outside_canvas(self):
+		sim = ShardedSimulation((0, 40, 0, 40), 100, 1, tiles=(2, 2), community_position=(50, 50), seed=1)
+		try:
+			owners = [tile for tile in sim.tiles if tile[0] <= 50 <= tile[1] and tile[2] <= 50 <= tile[3]]
+			self.assertEqual(len(owners), 1)
+			self.assertEqual(sim.shared.grid.shape[1:], (51, 51))
+			offsets = sim.shared.resident_offsets
+			self.assertEqual(offsets[-1], 100)
+			self.assertEqual(sorted(sim.shared.residents), list(range(100)))
+		finally:
+			sim.close()
+
+	def test_hand_over_matches_scan(self):
+		shape = (2, 2)
+		infections = [(InfectableType.SARSCoV2, 0.3)]
+		sim = ShardedSimulation((0, 40, 0, 40), 200, 1, tiles=shape, infections=infections, seed=3)
+		try:
+			s = sim.shared
+			workers = [TileWorker(s, worker_id, tile, sim.canvas, shape, sim.grid, sim.community_position, seed)
+					   for worker_id, (tile, seed) in enumerate(zip(sim.tiles, sim.seeds))]
+			for worker in workers:
+				worker.day_actions()
+			where = tile_index(s.position, sim.canvas, shape)
+			for worker in workers:
+				self.assertEqual(sorted(worker.arrivals()), list(np.flatnonzero(where == worker.worker_id)))
+		finally:
+			sim.close()
+
+	def test_unseeded_runs_differ(self):
+		homes = []
+		for _ in range(2):
+			sim = ShardedSimulation((0, 40, 0, 40), 100, 1, tiles=(2, 1))
+			try:
+				homes.append(np.array(sim.shared.home))
+			finally:
+				sim.close()
+		self.assertFalse(np.array_equal(homes[0], homes[1]))
+
+	def test_simulation(self):
+		infections = [(InfectableType.SARSCoV2, 0.1), (InfectableType.Cholera, 0.05)]
+		with ShardedSimulation((0, 40, 0, 40), 300, 1, capacity=10, tiles=(2, 1), infections=infections, seed=5) as sim:
+			for day in range(20):
+				sim.simulate_day()
+			df = sim.export_df()
+
+		self.assertEqual(len(df), 20)
+		self.assertGreater(df['infected_all'].sum(), 0)
+		self.assertLessEqual(df['recovered_all'].sum() + df['dead_all'].sum(), df['infected_all'].sum())
+		self.assertLessEqual(df['hospitalized'].cumsum().max(), 10)
+		self.assertGreaterEqual(df['hospitalized'].cumsum().min(), 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+
+from lib.deseases import InfectableType
+from lib.simulation import run_simulation, deaths_exceed
+from tests.helpers import new_context, run_days
+
+INFECTIONS = [(InfectableType.SeasonalFlu, 0.05)]
+
+
+class RunSimulationTest(unittest.TestCase):
+	def make_context(self, seed):
+		return new_context(seed, (0, 30, 0, 30), 60, capacity=5, infections=INFECTIONS)
+
+	def test_fast_forward(self):
+		full = run_days(self.make_context(3), 60)
+
+		context = self.make_context(3)
+		simulated = run_simulation(context, 60)
+
+		self.assertLess(simulated, 60)
+		self.assertTrue(full.observer.export_df().equals(context.observer.export_df()))
+		self.assertEqual(full.observer.policies, context.observer.policies)
+		self.assertEqual(str(full.policy), str(context.policy))
+
+	def test_stop_condition(self):
+		context = self.make_context(3)
+		self.assertEqual(run_simulation(context, 60, stop_conditions=[deaths_exceed(-1.0)]), 0)
+		self.assertEqual(len(context.observer.export_df()), 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from lib.deseases import InfectableType
+from lib.health import GlobalContext, DepartmentOfHealth
+from lib.simulation import simulate_day
+from lib.splitting import SplittingRunner, deaths, occupancy
+from tests.helpers import new_context
+
+
+def init():
+	# The runner seeds random itself
+	return new_context(canvas=(0, 30, 0, 30), n_persons=100, capacity=5, infections=[(InfectableType.Cholera, 0.05)])
+
+
+class SplittingTest(unittest.TestCase):
+	def test_clone(self):
+		runner = SplittingRunner(init, occupancy, [1], 20, seed=0)
+		trajectory = runner.start()
+		runner.advance(trajectory, 1)
+		clone = runner.clone(trajectory)
+
+		self.assertIs(GlobalContext(), clone.context)
+		self.assertIs(DepartmentOfHealth(None), clone.context.health_dept)
+		self.assertEqual(clone.best, trajectory.best)
+		simulate_day(clone.context)
+		self.assertEqual(clone.context.observer.day, trajectory.context.observer.day + 1)
+
+	def test_trajectories_keep_their_context(self):
+		runner = SplittingRunner(init, occupancy, [1000], 20, stop_when_extinct=False, seed=2)
+		trajectories = [runner.start() for _ in range(3)]
+		for trajectory in trajectories:
+			runner.advance(trajectory, 1000)
+
+		for trajectory in trajectories:
+			context = trajectory.context
+			persons = set(map(id, context.persons))
+			for hospital in context.health_dept.hospitals:
+				self.assertTrue(all(id(patient) in persons for patient in hospital.patients))
+			occupancy_curve = context.observer.export_df()['hospitalized'].cumsum()
+			self.assertGreaterEqual(occupancy_curve.min(), 0)
+			self.assertEqual(occupancy_curve.iloc[-1], occupancy(context))
+
+	def test_estimate(self):
+		runner = SplittingRunner(init, deaths, [0, 2, 4], 40, n_per_level=10, seed=1)
+		estimate = runner.run(repetitions=3)
+		self.assertEqual(len(estimate.results), 3)
+		for result in estimate.results:
+			self.assertEqual(result.stages[0], 1.0)
+			self.assertGreaterEqual(result.probability, 0.0)
+			self.assertLessEqual(result.probability, 1.0)
+		self.assertGreater(estimate.days_simulated, 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
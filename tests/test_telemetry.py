@@ -0,0 +1,70 @@
+import base64
+import json
+import os
+import socket
+import struct
+import unittest
+from urllib.request import urlopen
+
+from lib.deseases import InfectableType
+from lib.telemetry import TelemetryPublisher, TelemetryServer
+from tests.helpers import new_context, run_days
+
+
+def read_frame(sock):
+	header = sock.recv(2, socket.MSG_WAITALL)
+	length = header[1] & 0x7F
+	if length == 126:
+		length = struct.unpack('!H', sock.recv(2, socket.MSG_WAITALL))[0]
+	return sock.recv(length, socket.MSG_WAITALL)
+
+
+class TelemetryTest(unittest.TestCase):
+	def test_snapshots(self):
+		context = new_context(0, (0, 20, 0, 20), 40, 2, capacity=5, infections=[(InfectableType.SeasonalFlu, 0.1)])
+		publisher = TelemetryPublisher(context)
+		context.observer.subscribe(publisher)
+
+		with TelemetryServer(publisher) as server:
+			viewers = []
+			for _ in range(2):
+				sock = socket.create_connection(('127.0.0.1', server.port), timeout=5)
+				key = base64.b64encode(os.urandom(16)).decode()
+				sock.sendall('GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+							 'Sec-WebSocket-Key: {}\r\nSec-WebSocket-Version: 13\r\n\r\n'.format(key).encode())
+				response = b''
+				while not response.endswith(b'\r\n\r\n'):
+					response += sock.recv(1)
+				self.assertIn(b'101', response)
+				viewers.append(sock)
+
+			run_days(context, 3)
+
+			snapshot = json.loads(urlopen(server.url + '/').read())
+			self.assertEqual(snapshot['day'], 3)
+			self.assertEqual(len(snapshot['hospitals']), 2)
+			self.assertIn('interaction', snapshot['phase_timings'])
+
+			for sock in viewers:
+				# Frames of earlier days may come first
+				days = [json.loads(read_frame(sock))['day']]
+				while days[-1] < 3:
+					days.append(json.loads(read_frame(sock))['day'])
+				self.assertEqual(days[-1], 3)
+				sock.close()
+
+	def test_upgrade_without_key(self):
+		with TelemetryServer(TelemetryPublisher(None)) as server:
+			sock = socket.create_connection(('127.0.0.1', server.port), timeout=5)
+			sock.sendall(b'GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n\r\n')
+			response = b''
+			chunk = sock.recv(1024)
+			while chunk:
+				response += chunk
+				chunk = sock.recv(1024)
+			sock.close()
+			self.assertTrue(response.startswith(b'HTTP/1.1 400 Bad Request'))
+
+
+if __name__ == '__main__':
+	unittest.main()